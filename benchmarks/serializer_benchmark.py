@@ -0,0 +1,82 @@
+"""Compare size and speed of the JsonDatabase storage encodings
+
+Run from the repository root:
+    python benchmarks/serializer_benchmark.py [inventory_rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializers
+from columnar_storage import ColumnarReader, write_columnar
+
+
+def build_dataset(inventory_rows=50000, seed=1010):
+    """A campus-sized fleet with a long inventory and maintenance history"""
+    rng = random.Random(seed)
+    buildings = [{"id": i, "name": f"Building {i}", "location": rng.choice(['North Campus', 'Central Campus', 'South Campus'])}
+                 for i in range(1, 41)]
+    machines = [{"id": i, "name": f"{rng.choice(['Snack', 'Drink'])} Machine {i}", "building_id": rng.randint(1, 40),
+                 "location_description": f"Floor {rng.randint(1, 5)} Hallway",
+                 "last_maintenance_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"}
+                for i in range(1, 401)]
+    products = [{"id": i, "name": f"Product {i}", "price": round(rng.uniform(0.75, 4.0), 2),
+                 "category": rng.choice(['Snacks', 'Drinks', 'Candy', 'Healthy'])}
+                for i in range(1, 201)]
+    inventory = [{"machine_id": rng.randint(1, 400), "product_id": rng.randint(1, 200), "quantity": rng.randint(0, 30),
+                  "last_restock_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", "id": i}
+                 for i in range(1, inventory_rows + 1)]
+    maintenance = [{"machine_id": rng.randint(1, 400), "maintenance_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                    "description": rng.choice(['Regular maintenance', 'Fixed coin slot', 'Replaced display', 'Cleared jam']),
+                    "performed_by": rng.choice(['John Doe', 'Jane Smith', 'Sam Lee']), "id": i}
+                   for i in range(1, inventory_rows // 2 + 1)]
+    return {"buildings": buildings, "vending_machines": machines, "products": products,
+            "inventory": inventory, "maintenance_records": maintenance}
+
+
+def timed(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    data = build_dataset(rows)
+    results = []
+    for serializer in serializers.available_serializers():
+        for compression in serializers.available_compressions():
+            encode_time, raw = timed(lambda: serializers.dumps(data, serializer, compression))
+            decode_time, _ = timed(lambda: serializers.loads(raw))
+            results.append((f"{serializer}" + (f"+{compression}" if compression else ""), len(raw), encode_time, decode_time))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.vdb')
+        encode_time, _ = timed(lambda: write_columnar(path, data))
+
+        def open_and_read():
+            reader = ColumnarReader(path)
+            for table in reader.tables:
+                reader.rows(table)
+            reader.close()
+        decode_time, _ = timed(open_and_read)
+        results.append(('columnar (mmap)', os.path.getsize(path), encode_time, decode_time))
+
+    baseline = results[0][1]
+    print(f"Dataset: {rows} inventory rows, {rows // 2} maintenance records")
+    print(f"{'Format':<20} {'Size (KB)':>10} {'Ratio':>6} {'Encode (ms)':>12} {'Decode (ms)':>12}")
+    print("-" * 64)
+    for name, size, encode_time, decode_time in results:
+        print(f"{name:<20} {size / 1024:>10.0f} {size / baseline:>6.2f} {encode_time * 1000:>12.1f} {decode_time * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
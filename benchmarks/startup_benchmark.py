@@ -0,0 +1,75 @@
+"""Measure how long the CLI takes to start, to catch startup regressions
+
+Run from the repository root:
+    python benchmarks/startup_benchmark.py [runs] [target_ms]
+
+Each run starts a fresh interpreter in a scratch directory and times
+importing main and building VendingMachineSystem, for both the JSON
+application (main.py) and the SQLite one (src/main.py). The first run
+also creates the data files; the rest open them as a normal launch does.
+Exits with status 1 if a median goes over target_ms (default 100) or if
+pandas or matplotlib were imported during startup.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Child process body: time the imports and construction, then report which
+# heavy modules got pulled in
+CHILD = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {path!r})
+from {module} import VendingMachineSystem
+VendingMachineSystem()
+elapsed = (time.perf_counter() - start) * 1000
+heavy = [name for name in ('pandas', 'matplotlib') if name in sys.modules]
+print(elapsed, ','.join(heavy))
+"""
+
+APPS = {
+    "json": (os.path.dirname(ROOT), f"{os.path.basename(ROOT)}.main"),
+    "sqlite": (os.path.join(ROOT, "src"), "main")
+}
+
+
+def time_startup(app, workdir):
+    """Return (in-process ms, whole-process ms, heavy modules) for one launch"""
+    path, module = APPS[app]
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD.format(path=path, module=module)],
+                            cwd=workdir, capture_output=True, text=True, check=True).stdout
+    wall = (time.perf_counter() - start) * 1000
+    elapsed, _, heavy = output.strip().rpartition('\n')[2].partition(' ')
+    return float(elapsed), wall, [name for name in heavy.split(',') if name]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    target_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 100.0
+    failed = False
+
+    print(f"{'app':<8} {'first run':>10} {'median':>10} {'process':>10}  heavy imports")
+    for app in APPS:
+        with tempfile.TemporaryDirectory() as workdir:
+            results = [time_startup(app, workdir) for _ in range(runs + 1)]
+        first = results[0][0]
+        median = statistics.median(r[0] for r in results[1:])
+        process = statistics.median(r[1] for r in results[1:])
+        heavy = sorted({name for r in results for name in r[2]})
+        print(f"{app:<8} {first:>8.1f}ms {median:>8.1f}ms {process:>8.1f}ms  {', '.join(heavy) or '-'}")
+        failed = failed or median > target_ms or bool(heavy)
+
+    if failed:
+        print(f"FAIL: startup over {target_ms:.0f} ms or heavy modules imported at startup")
+        sys.exit(1)
+    print(f"OK: every median under {target_ms:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
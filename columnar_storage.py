@@ -0,0 +1,251 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+# File layout:
+#   8 byte magic, 8 byte header length, JSON header, padding to 8 bytes,
+#   then the data section holding every column array and the string table.
+# Numeric columns are fixed-width arrays in native byte order. Text (and
+# any column with mixed types, stored as JSON text) is a uint32 array of
+# indexes into a shared, de-duplicated string table.
+MAGIC = b'VMCOL1\x00\x00'
+
+# Column type -> array typecode
+TYPECODES = {
+    'int': 'q',
+    'float': 'd',
+    'bool': 'b',
+    'str': 'I',
+    'json': 'I'
+}
+
+# Per-row flags stored in a column's mask when it has gaps
+PRESENT, NULL, MISSING = 0, 1, 2
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _column_type(values):
+    kinds = {type(v) for v in values if v is not None}
+    if kinds == {bool}:
+        return 'bool'
+    if kinds == {int} and all(INT64_MIN <= v <= INT64_MAX for v in values if v is not None):
+        return 'int'
+    if kinds == {float}:
+        return 'float'
+    if kinds <= {str}:
+        return 'str'
+    return 'json'
+
+
+def _pad(buf):
+    buf.extend(b'\x00' * (-len(buf) % 8))
+
+
+def write_columnar(path, data):
+    """Write {table: [record, ...]} to `path` in the columnar format"""
+    body = bytearray()
+    strings = {}
+    header = {"byteorder": sys.byteorder, "tables": {}}
+
+    def intern(text):
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    def put(arr):
+        _pad(body)
+        offset = len(body)
+        body.extend(arr.tobytes())
+        return offset
+
+    for table, rows in data.items():
+        fields = list(dict.fromkeys(key for row in rows for key in row))
+        columns = {}
+        for field in fields:
+            raw = [row.get(field) for row in rows]
+            kind = _column_type(raw)
+            mask = array('B', (PRESENT if field in row and row[field] is not None
+                               else NULL if field in row else MISSING for row in rows))
+            if kind == 'str':
+                values = array('I', (intern(v) if v is not None else 0 for v in raw))
+            elif kind == 'json':
+                values = array('I', (intern(json.dumps(v)) for v in raw))
+            else:
+                values = array(TYPECODES[kind], (v if v is not None else 0 for v in raw))
+            column = {"type": kind, "offset": put(values)}
+            if any(mask):
+                column["mask"] = put(mask)
+            columns[field] = column
+        header["tables"][table] = {"rows": len(rows), "columns": columns}
+
+    blobs = [text.encode('utf-8') for text in strings]
+    offsets = array('Q', [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    header["strings"] = {"count": len(blobs), "offsets": put(offsets)}
+    header["strings"]["data"] = len(body)
+    body.extend(b''.join(blobs))
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    prefix = bytearray(MAGIC + struct.pack('<Q', len(header_bytes)) + header_bytes)
+    _pad(prefix)
+    with open(path, 'wb') as f:
+        f.write(prefix)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def is_columnar(path):
+    """Check whether `path` holds a columnar file"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class ColumnarReader:
+    """Memory-mapped, read-only view of a columnar file
+
+    Only the header is parsed on open. Column arrays are sliced straight out
+    of the mapping when asked for, so untouched columns are never read.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a columnar database file")
+        (header_len,) = struct.unpack_from('<Q', self._map, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self._map[start:start + header_len])
+        if self.header["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{path} was written on a {self.header['byteorder']}-endian machine")
+        self._base = start + header_len + (-(start + header_len) % 8)
+        self._view = memoryview(self._map)
+        self._offsets = None
+        self._string_cache = {}
+
+    @property
+    def tables(self):
+        return list(self.header["tables"])
+
+    def row_count(self, table):
+        return self.header["tables"][table]["rows"]
+
+    def fields(self, table):
+        return list(self.header["tables"][table]["columns"])
+
+    def _array(self, offset, typecode, count):
+        start = self._base + offset
+        size = struct.calcsize(typecode) * count
+        return self._view[start:start + size].cast(typecode)
+
+    def _string(self, index):
+        text = self._string_cache.get(index)
+        if text is None:
+            strings = self.header["strings"]
+            if self._offsets is None:
+                self._offsets = self._array(strings["offsets"], 'Q', strings["count"] + 1)
+            start = self._base + strings["data"]
+            text = str(self._map[start + self._offsets[index]:start + self._offsets[index + 1]], 'utf-8')
+            self._string_cache[index] = text
+        return text
+
+    def raw_column(self, table, field):
+        """Return (values, mask) as zero-copy views; mask is None without gaps"""
+        info = self.header["tables"][table]
+        column = info["columns"][field]
+        values = self._array(column["offset"], TYPECODES[column["type"]], info["rows"])
+        mask = None
+        if "mask" in column:
+            mask = self._array(column["mask"], 'B', info["rows"])
+        return values, mask
+
+    def column(self, table, field):
+        """Decode one column into a list of Python values (None where absent)"""
+        info = self.header["tables"][table]
+        if field not in info["columns"]:
+            return [None] * info["rows"]
+        kind = info["columns"][field]["type"]
+        values, mask = self.raw_column(table, field)
+        if kind == 'str':
+            decode = self._string
+        elif kind == 'json':
+            decode = lambda i: json.loads(self._string(i))
+        elif kind == 'bool':
+            decode = bool
+        else:
+            decode = None
+        if mask is None:
+            return values.tolist() if decode is None else [decode(v) for v in values]
+        if decode is None:
+            decode = lambda v: v
+        return [decode(v) if m == PRESENT else None for v, m in zip(values, mask)]
+
+    def array(self, table, field):
+        """Decode one column into a numpy array (object dtype where absent or text)
+
+        Numbers are copied out of the mapping in one go and each distinct
+        string is decoded once, so no per-row Python work is done.
+        """
+        import numpy as np
+        info = self.header["tables"][table]
+        if field not in info["columns"]:
+            return np.full(info["rows"], None, dtype=object)
+        kind = info["columns"][field]["type"]
+        values, mask = self.raw_column(table, field)
+        try:
+            if kind in ('str', 'json'):
+                indexes, positions = np.unique(np.array(values), return_inverse=True)
+                decode = self._string if kind == 'str' else lambda i: json.loads(self._string(i))
+                texts = np.empty(len(indexes), dtype=object)
+                texts[:] = [decode(int(i)) for i in indexes]
+                result = texts[positions.reshape(-1)]
+            else:
+                result = np.array(values, dtype=bool if kind == 'bool' else None)
+            if mask is not None:
+                absent = np.array(mask) != PRESENT
+                if absent.any():
+                    result = result.astype(object)
+                    result[absent] = None
+        finally:
+            values.release()
+            if mask is not None:
+                mask.release()
+        return result
+
+    def rows(self, table):
+        """Materialize every row of `table` as a dict"""
+        fields = self.fields(table)
+        columns = [self.column(table, field) for field in fields]
+        masks = [self.raw_column(table, field)[1] for field in fields]
+        result = []
+        for i in range(self.row_count(table)):
+            row = {}
+            for field, values, mask in zip(fields, columns, masks):
+                if mask is None or mask[i] != MISSING:
+                    row[field] = values[i]
+            result.append(row)
+        return result
+
+    def close(self):
+        """Unmap the file; views from raw_column() must be released first"""
+        for name in ('_offsets', '_view'):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+                setattr(self, name, None)
+        self._map.close()
+        self._file.close()
+
+
+def replace_columnar(path, data):
+    """Write to a temporary file and swap it into place"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write_columnar(tmp_path, data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,366 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+
+# Sorts after every record id, for bisecting past all entries with one key
+_LAST_ID = float('inf')
+
+
+class TableIndex:
+    """Lookup structure over one table kept current by the backend's write notifications
+
+    The index is built when created and then updated in place by every
+    write it is notified of. If the table's change counter shows a change
+    it was not told about, such as a reload or a rolled back SQLite
+    transaction, it is rebuilt from the table instead. Subclasses set
+    `table` and implement _add(), _remove() and _rebuild(); _entries maps
+    the id of every record held to whatever _remove() needs.
+    """
+
+    table = None
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.RLock()
+        self._entries = {}
+        # Change counter of `table` the index matches
+        self._generation = None
+        db.subscribe(self.table, self._on_write)
+        with self._lock:
+            self._fresh()
+
+    def _current_generation(self, external=True):
+        return self.db.generation(self.table, external)
+
+    def _on_write(self, old, new):
+        with self._lock:
+            # Outside commits are caught by _fresh() on the next read
+            generation = self._current_generation(external=False)
+            if self._generation != generation - 1:
+                self._rebuild()
+                return
+            self._generation = generation
+            if old is not None:
+                self._remove(old['id'])
+            if new is not None:
+                self._add(new)
+
+    def _add(self, record):
+        raise NotImplementedError
+
+    def _remove(self, record_id):
+        raise NotImplementedError
+
+    def _fresh(self):
+        """Rebuild if stale; call with the lock held before reading"""
+        if self._generation != self._current_generation():
+            self._rebuild()
+
+    def _rebuild(self):
+        """Rebuild from the table and set _generation; call with the lock held"""
+        raise NotImplementedError
+
+    def __len__(self):
+        with self._lock:
+            self._fresh()
+            return len(self._entries)
+
+
+class SortedIndex(TableIndex):
+    """(key, id) pairs of one table kept in order
+
+    Subclasses set `table` and implement _entry().
+    """
+
+    def __init__(self, db):
+        self._keys = []
+        super().__init__(db)
+
+    def _entry(self, record):
+        """Return (key, details) for a record, or None to leave it out"""
+        raise NotImplementedError
+
+    def _add(self, record):
+        entry = self._entry(record)
+        if entry is not None:
+            self._entries[record['id']] = entry
+            insort(self._keys, (entry[0], record['id']))
+        return entry
+
+    def _remove(self, record_id):
+        entry = self._entries.pop(record_id, None)
+        if entry is not None:
+            position = bisect_left(self._keys, (entry[0], record_id))
+            del self._keys[position]
+        return entry
+
+    def _rebuild(self):
+        records = self.db.execute_query(self.table)
+        self._entries = {}
+        keys = []
+        for record in records:
+            entry = self._entry(record)
+            if entry is not None:
+                self._entries[record['id']] = entry
+                keys.append((entry[0], record['id']))
+        keys.sort()
+        self._keys = keys
+        # Read after the query, which may itself load the table
+        self._generation = self._current_generation()
+
+    def _up_to(self, key, limit=None):
+        # Entries with a key <= `key`, lowest first: O(log n + k)
+        end = bisect_right(self._keys, (key, _LAST_ID))
+        if limit is not None:
+            end = min(end, limit)
+        return [(record_id, self._entries[record_id]) for _, record_id in self._keys[:end]]
+
+
+class LowStockIndex(SortedIndex):
+    """Inventory ordered by quantity, with per-product and per-machine thresholds
+
+    below(threshold) answers a fixed-threshold query. low_items() uses the
+    configured thresholds instead; for that a second list orders items by
+    quantity minus their own threshold. on_cross(inventory_id, machine_id,
+    product_id, quantity, is_low) is called when a write moves an item
+    to or below its threshold, or back above it or out of the table.
+    Crossings undone by a rollback, or made by another process, are
+    reported when the index is next rebuilt.
+    """
+
+    table = "inventory"
+
+    def __init__(self, db, default_threshold=5, on_cross=None):
+        self.default_threshold = default_threshold
+        self.on_cross = on_cross
+        self.product_thresholds = {}
+        self.machine_thresholds = {}
+        self.item_thresholds = {}
+        self._margins = []
+        self._rebuilt = False
+        super().__init__(db)
+
+    def threshold_for(self, machine_id, product_id):
+        """Most specific threshold: machine and product, product, machine, default"""
+        threshold = self.item_thresholds.get((machine_id, product_id))
+        if threshold is None:
+            threshold = self.product_thresholds.get(product_id)
+        if threshold is None:
+            threshold = self.machine_thresholds.get(machine_id, self.default_threshold)
+        return threshold
+
+    def set_threshold(self, threshold, machine_id=None, product_id=None):
+        """Set the threshold for a machine, a product, one pair, or the default"""
+        with self._lock:
+            if machine_id is not None and product_id is not None:
+                self.item_thresholds[(machine_id, product_id)] = threshold
+            elif product_id is not None:
+                self.product_thresholds[product_id] = threshold
+            elif machine_id is not None:
+                self.machine_thresholds[machine_id] = threshold
+            else:
+                self.default_threshold = threshold
+            self._sort_margins()
+
+    def below(self, threshold, limit=None):
+        """(inventory_id, machine_id, product_id, quantity) with quantity <= threshold
+
+        Lowest quantity first, at most `limit` of them.
+        """
+        with self._lock:
+            self._fresh()
+            return [(record_id,) + entry[1] for record_id, entry in self._up_to(threshold, limit)]
+
+    def low_items(self, limit=None):
+        """Like below(), but each item against its own configured threshold"""
+        with self._lock:
+            self._fresh()
+            end = bisect_right(self._margins, (0, _LAST_ID))
+            if limit is not None:
+                end = min(end, limit)
+            return [(record_id,) + self._entries[record_id][1] for _, record_id in self._margins[:end]]
+
+    def _entry(self, record):
+        if record.get('quantity') is None:
+            return None
+        return record['quantity'], (record.get('machine_id'), record.get('product_id'), record['quantity'])
+
+    def _margin(self, entry):
+        machine_id, product_id, quantity = entry[1]
+        return quantity - self.threshold_for(machine_id, product_id)
+
+    def _sort_margins(self):
+        self._margins = sorted((self._margin(entry), record_id) for record_id, entry in self._entries.items())
+
+    def _low_entries(self):
+        end = bisect_right(self._margins, (0, _LAST_ID))
+        return {record_id: self._entries[record_id] for _, record_id in self._margins[:end]}
+
+    def _rebuild(self):
+        # Nothing has been reported before the first build
+        before = self._low_entries() if self._generation is not None else None
+        super()._rebuild()
+        self._sort_margins()
+        self._rebuilt = True
+        if self.on_cross is None or before is None:
+            return
+        after = self._low_entries()
+        for record_id in sorted(before.keys() ^ after.keys()):
+            is_low = record_id in after
+            entry = after[record_id] if is_low else self._entries.get(record_id, before[record_id])
+            self.on_cross(record_id, *entry[1], is_low)
+
+    def _add(self, record):
+        entry = super()._add(record)
+        if entry is not None:
+            insort(self._margins, (self._margin(entry), record['id']))
+        return entry
+
+    def _remove(self, record_id):
+        entry = super()._remove(record_id)
+        if entry is not None:
+            del self._margins[bisect_left(self._margins, (self._margin(entry), record_id))]
+        return entry
+
+    def _on_write(self, old, new):
+        with self._lock:
+            before = self._entries.get(old['id']) if old is not None else None
+            self._rebuilt = False
+            super()._on_write(old, new)
+            # A rebuild has already reported every crossing
+            if self.on_cross is None or self._rebuilt:
+                return
+            after = self._entries.get(new['id']) if new is not None else None
+            was_low = before is not None and self._margin(before) <= 0
+            is_low = after is not None and self._margin(after) <= 0
+            if was_low != is_low:
+                record_id, entry = (new['id'], after) if after is not None else (old['id'], before)
+                self.on_cross(record_id, *entry[1], is_low)
+
+
+def low_stock_index(db, on_cross=None):
+    """The LowStockIndex shared by everything using `db`
+
+    on_cross, if given, becomes the index's on_cross callback.
+    """
+    index = db.index('low_stock', LowStockIndex)
+    if on_cross is not None:
+        index.on_cross = on_cross
+    return index
+
+
+class MaintenanceDueIndex(SortedIndex):
+    """Vending machines ordered by last maintenance date, held as a date ordinal
+
+    Each date is parsed once, when its machine is written, so due and
+    overdue queries are a bisect instead of a parse of every machine.
+    Machines without a valid date are left out.
+    """
+
+    table = "vending_machines"
+
+    def due(self, interval=30, within=0, today=None, limit=None):
+        """(machine_id, days since maintenance) for machines due within `within` days
+
+        A machine is due `interval` days after its last maintenance; the
+        default within=0 lists the ones due today or overdue. Most overdue
+        first, at most `limit` of them.
+        """
+        today = (today or date.today()).toordinal()
+        with self._lock:
+            self._fresh()
+            return [(machine_id, today - ordinal)
+                    for machine_id, (ordinal, _) in self._up_to(today + within - interval, limit)]
+
+    def most_overdue(self, k, today=None):
+        """The k machines with the oldest maintenance, as due() returns them"""
+        today = (today or date.today()).toordinal()
+        with self._lock:
+            self._fresh()
+            return [(machine_id, today - self._entries[machine_id][0]) for _, machine_id in self._keys[:k]]
+
+    def _entry(self, record):
+        try:
+            ordinal = date.fromisoformat(record.get('last_maintenance_date')[:10]).toordinal()
+        except (TypeError, ValueError):
+            return None
+        return ordinal, None
+
+
+def maintenance_due_index(db):
+    """The MaintenanceDueIndex shared by everything using `db`"""
+    return db.index('maintenance_due', MaintenanceDueIndex)
+
+
+class SalesRollupIndex(TableIndex):
+    """Sales rollups by granularity, period and (machine, product)
+
+    Each granularity keeps its distinct periods in order and each period a
+    (machine_id, product_id) -> rollup dict, so recording a sale finds the
+    rollup rows it adds to without a scan, and a sales query only visits
+    the periods it asks for. Most writes leave the period lists alone.
+    """
+
+    table = "sales_rollups"
+
+    def __init__(self, db):
+        self._periods = {}
+        self._rollups = {}
+        super().__init__(db)
+
+    def find(self, granularity, period, machine_id, product_id):
+        """The rollup record for one period, machine and product, or None"""
+        with self._lock:
+            self._fresh()
+            return self._rollups.get((granularity, period), {}).get((machine_id, product_id))
+
+    def scan(self, granularity, low=None, high=None):
+        """Rollup records of `granularity` with low <= period <= high, in period order
+
+        Treat the records as read-only.
+        """
+        with self._lock:
+            self._fresh()
+            periods = self._periods.get(granularity, [])
+            start = bisect_left(periods, low) if low is not None else 0
+            end = bisect_right(periods, high) if high is not None else len(periods)
+            return [record for period in periods[start:end]
+                    for record in self._rollups[(granularity, period)].values()]
+
+    def _add(self, record):
+        key = (record.get('granularity'), record.get('period'))
+        bucket = self._rollups.get(key)
+        if bucket is None:
+            bucket = self._rollups[key] = {}
+            insort(self._periods.setdefault(key[0], []), key[1])
+        item = (record.get('machine_id'), record.get('product_id'))
+        bucket[item] = record
+        self._entries[record['id']] = (key, item)
+
+    def _remove(self, record_id):
+        entry = self._entries.pop(record_id, None)
+        if entry is None:
+            return
+        key, item = entry
+        bucket = self._rollups[key]
+        # Only if no duplicate row has taken the slot since
+        if bucket[item]['id'] != record_id:
+            return
+        del bucket[item]
+        if not bucket:
+            del self._rollups[key]
+            periods = self._periods[key[0]]
+            del periods[bisect_left(periods, key[1])]
+
+    def _rebuild(self):
+        self._periods = {}
+        self._rollups = {}
+        self._entries = {}
+        for record in self.db.execute_query(self.table):
+            self._add(record)
+        self._generation = self._current_generation()
+
+
+def sales_rollup_index(db):
+    """The SalesRollupIndex shared by everything using `db`"""
+    return db.index('sales_rollups', SalesRollupIndex)
@@ -1,28 +1,92 @@
 from .json_database import JsonDatabase as Database
+from .indexes import low_stock_index
 from datetime import datetime
+import csv
+import json
+
+# Columns every restock manifest row must have
+MANIFEST_FIELDS = ("machine_id", "product_id", "quantity")
+
+
+def whole_number(value, field):
+    """Return `value` as an int, or raise ValueError naming `field`
+
+    Accepts ints, integral floats such as 3.0 and strings of either.
+    Booleans and fractions are rejected rather than truncated.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    # int() would truncate a float, so only take the ones without a fraction
+    if isinstance(value, (float, str)):
+        try:
+            number = float(value)
+        except ValueError:
+            number = None
+        if number is not None and number.is_integer():
+            return int(number)
+    raise ValueError(f"{field} must be a whole number, got {value!r}")
+
+
+def read_manifest(path):
+    """Yield (line number, row dict) from a CSV or JSONL restock manifest
+
+    The file is streamed, never read whole. CSV files need a header row
+    naming MANIFEST_FIELDS; any file ending in .jsonl or .ndjson is read
+    as one JSON object per line. Lines that cannot be parsed are yielded
+    with a ValueError in place of the row.
+    """
+    # utf-8-sig drops the byte order mark Excel puts in front of CSV exports
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_no, ValueError(f"invalid JSON: {e}")
+                    continue
+                if not isinstance(row, dict):
+                    yield line_no, ValueError("expected a JSON object")
+                    continue
+                yield line_no, row
+        else:
+            reader = csv.DictReader(f)
+            missing = [field for field in MANIFEST_FIELDS if field not in (reader.fieldnames or ())]
+            if missing:
+                raise ValueError(f"Manifest header is missing {', '.join(missing)}")
+            for row in reader:
+                yield reader.line_num, row
+
 
 class InventoryManager:
-    def __init__(self, db=None):
-        """Initialize the inventory manager"""
+    def __init__(self, db=None, on_low_stock=None):
+        """Initialize the inventory manager
+
+        on_low_stock is registered as the low stock index's on_cross callback.
+        """
         self.db = db if db else Database()
+        if on_low_stock is not None:
+            low_stock_index(self.db, on_low_stock)
     
     def get_all_machines(self):
         """Get list of all vending machines"""
         machines = self.db.execute_query("vending_machines")
-        buildings = {b['id']: b for b in self.db.execute_query("buildings")}
+        building_names = self.db.machine_buildings()
         result = []
         for m in machines:
-            building_name = buildings.get(m['building_id'], {}).get('name', '')
-            result.append((m['id'], m['name'], building_name, m['location_description'], m['last_maintenance_date']))
+            result.append((m['id'], m['name'], building_names.get(m['id'], ''), m['location_description'], m['last_maintenance_date']))
         return result
     
     def get_machine_inventory(self, machine_id):
         """Get inventory for a specific machine"""
-        inventory = [i for i in self.db.execute_query("inventory") if i['machine_id'] == machine_id]
-        products = {p['id']: p for p in self.db.execute_query("products")}
         result = []
-        for item in inventory:
-            product = products.get(item['product_id'])
+        for item, product in self.db.execute_join("inventory", "products", "product_id", machine_id=machine_id):
             if product:
                 result.append((product['id'], product['name'], product['price'], item['quantity'], item['last_restock_date']))
         return result
@@ -30,30 +94,37 @@ class InventoryManager:
     def update_inventory(self, machine_id, product_id, new_quantity):
         """Update product quantity in machine"""
         current_date = datetime.now().strftime('%Y-%m-%d')
-        for item in self.db.execute_query("inventory"):
-            if item['machine_id'] == machine_id and item['product_id'] == product_id:
-                self.db.execute_update("inventory", item['id'], {"quantity": new_quantity, "last_restock_date": current_date})
-                print(f"Updated product {product_id} in machine {machine_id} to quantity {new_quantity}")
-                return
+        for item in self.db.execute_query("inventory", machine_id=machine_id, product_id=product_id):
+            self.db.execute_update("inventory", item['id'], {"quantity": new_quantity, "last_restock_date": current_date})
+            print(f"Updated product {product_id} in machine {machine_id} to quantity {new_quantity}")
+            return
         print("Inventory item not found.")
     
     def get_low_stock_items(self, threshold=5):
-        """Get items that are below threshold quantity"""
-        inventory = self.db.execute_query("inventory")
-        products = {p['id']: p for p in self.db.execute_query("products")}
-        machines = {m['id']: m for m in self.db.execute_query("vending_machines")}
-        buildings = {b['id']: b for b in self.db.execute_query("buildings")}
+        """Get items at or below threshold quantity, lowest first
+        
+        With threshold=None each item is held to its own threshold from
+        set_low_stock_threshold().
+        """
+        index = low_stock_index(self.db)
+        items = index.below(threshold) if threshold is not None else index.low_items()
+        products = self.db.lookup("products")
+        machines = self.db.lookup("vending_machines")
+        buildings = self.db.lookup("buildings")
         
         low_stock = []
-        for item in inventory:
-            if item['quantity'] <= threshold:
-                machine = machines.get(item['machine_id'], {})
-                building = buildings.get(machine.get('building_id'))
-                product = products.get(item['product_id'])
-                if machine and building and product:
-                    low_stock.append((machine['name'], building['name'], product['name'], item['quantity']))
+        for _, machine_id, product_id, quantity in items:
+            machine = machines.get(machine_id, {})
+            building = buildings.get(machine.get('building_id'))
+            product = products.get(product_id)
+            if machine and building and product:
+                low_stock.append((machine['name'], building['name'], product['name'], quantity))
         return low_stock
     
+    def set_low_stock_threshold(self, threshold, machine_id=None, product_id=None):
+        """Set the low stock threshold for a machine, a product, one pair or by default"""
+        low_stock_index(self.db).set_threshold(threshold, machine_id, product_id)
+    
     def add_new_product(self, name, price, category):
         """Add a new product to the database"""
         product_id = self.db.execute_insert("products", {
@@ -75,3 +146,78 @@ class InventoryManager:
         })
         print(f"Added product {product_id} to machine {machine_id} with quantity {quantity}")
         return inventory_id
+    
+    def import_restock_manifest(self, path, max_errors=100):
+        """Apply a restock manifest of (machine_id, product_id, quantity) rows
+        
+        Each row sets the quantity of a product in a machine, adding it to the
+        machine if it is not stocked there yet. Rows naming an unknown machine
+        or product, or without a valid non-negative quantity, are skipped and
+        reported. If a pair appears more than once the last row wins, so
+        memory grows with the number of distinct pairs, not manifest lines.
+        Every change is written in one transaction.
+        
+        Returns a dict with row, update, add and error counts plus the first
+        `max_errors` errors as (line number, message) pairs.
+        """
+        machines = self.db.lookup("vending_machines")
+        products = self.db.lookup("products")
+        quantities = {}
+        rows = 0
+        error_count = 0
+        errors = []
+        
+        for line_no, row in read_manifest(path):
+            rows += 1
+            try:
+                if isinstance(row, ValueError):
+                    raise row
+                missing = [field for field in MANIFEST_FIELDS if row.get(field) in (None, '')]
+                if missing:
+                    raise ValueError(f"missing {', '.join(missing)}")
+                machine_id, product_id, quantity = (whole_number(row[field], field) for field in MANIFEST_FIELDS)
+                if machine_id not in machines:
+                    raise ValueError(f"unknown machine {machine_id}")
+                if product_id not in products:
+                    raise ValueError(f"unknown product {product_id}")
+                if quantity < 0:
+                    raise ValueError("quantity cannot be negative")
+            except (TypeError, ValueError) as e:
+                error_count += 1
+                if len(errors) < max_errors:
+                    errors.append((line_no, str(e)))
+                continue
+            quantities[(machine_id, product_id)] = quantity
+        
+        current_date = datetime.now().strftime('%Y-%m-%d')
+        existing = {(item['machine_id'], item['product_id']): item['id']
+                    for item in self.db.execute_query("inventory")}
+        updated = 0
+        new_items = []
+        with self.db.transaction():
+            for (machine_id, product_id), quantity in quantities.items():
+                inventory_id = existing.get((machine_id, product_id))
+                if inventory_id is None:
+                    new_items.append({
+                        "machine_id": machine_id,
+                        "product_id": product_id,
+                        "quantity": quantity,
+                        "last_restock_date": current_date
+                    })
+                else:
+                    self.db.execute_update("inventory", inventory_id, {"quantity": quantity, "last_restock_date": current_date})
+                    updated += 1
+            self.db.execute_many("inventory", new_items)
+        
+        print(f"Imported {path}: {rows} rows, {updated} updated, {len(new_items)} added, {error_count} errors")
+        for line_no, message in errors:
+            print(f"  line {line_no}: {message}")
+        if error_count > len(errors):
+            print(f"  ... and {error_count - len(errors)} more errors")
+        return {
+            "rows": rows,
+            "updated": updated,
+            "added": len(new_items),
+            "error_count": error_count,
+            "errors": errors
+        }
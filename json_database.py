@@ -1,55 +1,477 @@
 import json
 import os
+import threading
+from contextlib import contextmanager
 
-class JsonDatabase:
-    def __init__(self, json_path='data/vending_data.json'):
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+from . import serializers
+from .columnar_storage import ColumnarReader, is_columnar, replace_columnar
+from .storage import TABLES, MemoryDatabase
+
+# File extension per storage format in the split layout
+TABLE_EXTENSIONS = {
+    'json': '.json',
+    'columnar': '.vdb'
+}
+
+def lock_file(f, exclusive=True):
+    """Take an advisory lock on an open file, blocking until it is free"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    else:
+        # msvcrt only has exclusive byte-range locks
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write(path, raw):
+    """Write bytes to a temp file, fsync it and rename it over `path`
+
+    A crash at any point leaves either the old file or the new one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class JsonDatabase(MemoryDatabase):
+    def __init__(self, json_path='data/vending_data.json', journal=False, checkpoint_interval=1000,
+                 storage_format='json', layout='single', serializer='json', compression=None,
+                 save_delay=None, shared=False):
+        super().__init__()
         self.json_path = json_path
+        # 'json' or 'columnar'; load() detects either, save() writes this one
+        if storage_format not in ('json', 'columnar'):
+            raise ValueError(f"Unknown storage format: {storage_format}")
+        self.storage_format = storage_format
+        # Encoding of 'json' format files: json (indented), compact, fast,
+        # msgpack; optionally compressed with gzip, zstd, xz or bz2
+        serializers.check_options(serializer, compression)
+        self.serializer = serializer
+        self.compression = compression
+        # 'single' keeps every table in json_path; 'split' gives each table
+        # its own file in a directory named after it (data/vending_data/)
+        if layout not in ('single', 'split'):
+            raise ValueError(f"Unknown layout: {layout}")
+        self.layout = layout
+        self.table_dir = os.path.splitext(json_path)[0]
+        # In journal mode writes are appended to a log next to the snapshot
+        # and folded back into it every `checkpoint_interval` entries.
+        self.journal = journal
+        self.journal_path = json_path + '.journal'
+        self.checkpoint_interval = checkpoint_interval
+        self.journal_entries = 0
+        # With a save_delay (seconds) writes only mark the store dirty; a
+        # background thread persists everything changed in that window at
+        # once. flush() and close() write out anything still pending.
+        self.save_delay = save_delay
+        self._lock = threading.RLock()
+        self._timer = None
+        self._journal_buffer = []
+        # Shared mode coordinates several processes using the same files:
+        # writers hold an exclusive lock on <path>.lock and bump the counter
+        # in <path>.version on every commit; anyone whose in-memory copy is
+        # older reloads it. A stat() of the version file is enough to tell
+        # whether anything changed, so reads take no lock.
+        if shared and save_delay is not None:
+            raise ValueError("shared mode cannot delay saves")
+        self.shared = shared
+        self.lock_path = json_path + '.lock'
+        self.version_path = json_path + '.version'
+        self._version_stat = None
+        self._lock_file = None
+        self._lock_depth = 0
+        # Columnar and split-layout tables are only read on first access,
+        # and in the split layout only tables changed since the last save
+        # are written back.
+        self._reader = None
+        self._unloaded = set()
+        self._dirty = set()
         os.makedirs(os.path.dirname(json_path), exist_ok=True)
-        if not os.path.exists(self.json_path):
-            self.data = {
-                "buildings": [],
-                "vending_machines": [],
-                "products": [],
-                "inventory": [],
-                "maintenance_records": []
-            }
+        if layout == 'split':
+            os.makedirs(self.table_dir, exist_ok=True)
+            exists = bool(self._table_files())
+        else:
+            exists = os.path.exists(self.json_path)
+        if shared:
+            self._lock_file = open(self.lock_path, 'a+')
+            lock_file(self._lock_file)
+            self._lock_depth += 1
+            # Another process may have created the store while we waited
+            if layout == 'split':
+                exists = bool(self._table_files())
+            else:
+                exists = os.path.exists(self.json_path)
+        try:
+            self._open(exists)
+        finally:
+            if shared:
+                self._lock_depth -= 1
+                unlock_file(self._lock_file)
+
+    def _open(self, exists):
+        if not exists:
+            self._set_data({table: [] for table in TABLES})
+            self._dirty = set(self.tables)
             self.save()
+            self._bump_version()
         else:
             self.load()
 
     def load(self):
-        with open(self.json_path, 'r') as f:
-            self.data = json.load(f)
+        # A shared lock keeps writers (and checkpoints) out while the
+        # snapshot and journal are read; writers already hold theirs.
+        reading = self.shared and not self._lock_depth
+        with self._lock:
+            if reading:
+                lock_file(self._lock_file, exclusive=False)
+            try:
+                self._load()
+            finally:
+                if reading:
+                    unlock_file(self._lock_file)
+
+    def _load(self):
+        if self.shared:
+            self.version, self._version_stat = self._disk_version()
+        self._close_reader()
+        if self.layout == 'split':
+            self._set_data({})
+            self._unloaded = set(self._table_files())
+        elif is_columnar(self.json_path):
+            self._set_data({})
+            self._reader = ColumnarReader(self.json_path)
+            self._unloaded = set(self._reader.tables)
+        else:
+            self._set_data(self._read_file(self.json_path))
+        self._replay_journal()
+
+    @property
+    def data(self):
+        with self._lock:
+            for table in list(self._unloaded):
+                self._load_table(table)
+            return {table: list(rows.values()) for table, rows in self.tables.items()}
 
     def save(self):
-        with open(self.json_path, 'w') as f:
-            json.dump(self.data, f, indent=4)
-
-    def execute_query(self, table, filter_fn=None):
-        records = self.data.get(table, [])
-        if filter_fn:
-            records = list(filter(filter_fn, records))
-        return records
-
-    def execute_insert(self, table, record):
-        record['id'] = self._generate_new_id(table)
-        self.data[table].append(record)
-        self.save()
-        return record['id']
-
-    def execute_update(self, table, record_id, update_fields):
-        for record in self.data.get(table, []):
-            if record['id'] == record_id:
-                record.update(update_fields)
+        with self._lock:
+            if self.layout == 'split':
+                for table in sorted(self._dirty):
+                    self._save_table(table)
+                self._dirty = set()
+                return
+            data = self.data
+            if self.storage_format == 'columnar':
+                # Everything is in memory now, so the old mapping can go
+                self._close_reader()
+                replace_columnar(self.json_path, data)
+            else:
+                self._write_file(self.json_path, data)
+            self._dirty = set()
+
+    def refresh(self):
+        """Reload if another process has committed since the last load
+
+        Returns True when the in-memory copy was replaced.
+        """
+        if not self.shared:
+            return False
+        with self._lock:
+            try:
+                st = os.stat(self.version_path)
+                signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                signature = None
+            if signature == self._version_stat:
+                return False
+            version, self._version_stat = self._disk_version()
+            if version == self.version:
+                return False
+            self.load()
+            return True
+
+    def _disk_version(self):
+        try:
+            st = os.stat(self.version_path)
+            with open(self.version_path, 'r') as f:
+                return int(f.read() or 0), (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return 0, None
+
+    def _bump_version(self):
+        self.version += 1
+        if self.shared:
+            atomic_write(self.version_path, str(self.version).encode())
+            st = os.stat(self.version_path)
+            self._version_stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the cross-process write lock, catching up with other writers first"""
+        if not self.shared or self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        lock_file(self._lock_file)
+        self._lock_depth += 1
+        try:
+            self.refresh()
+            yield
+        finally:
+            self._lock_depth -= 1
+            unlock_file(self._lock_file)
+
+    def flush(self):
+        """Persist any writes still waiting for the background save"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._journal_buffer:
+                self._append_journal(self._journal_buffer)
+            elif self._dirty and not self.journal:
                 self.save()
-                return True
-        return False
 
-    def _generate_new_id(self, table):
-        existing = self.data.get(table, [])
-        if not existing:
-            return 1
-        return max(item['id'] for item in existing) + 1
+    def _table_files(self):
+        """Map table name -> file path for the split layout"""
+        files = {}
+        for name in os.listdir(self.table_dir):
+            table, ext = os.path.splitext(name)
+            if ext in TABLE_EXTENSIONS.values():
+                files[table] = os.path.join(self.table_dir, name)
+        return files
+
+    def _save_table(self, table):
+        rows = list(self._rows(table).values())
+        path = os.path.join(self.table_dir, table + TABLE_EXTENSIONS[self.storage_format])
+        if self.storage_format == 'columnar':
+            replace_columnar(path, {table: rows})
+        else:
+            self._write_file(path, rows)
+        # Drop a copy left behind in the other format
+        for ext in TABLE_EXTENSIONS.values():
+            other = os.path.join(self.table_dir, table + ext)
+            if other != path and os.path.exists(other):
+                os.remove(other)
+
+    def _read_table_file(self, table):
+        path = self._table_files().get(table)
+        if path is None:
+            return []
+        if is_columnar(path):
+            reader = ColumnarReader(path)
+            try:
+                return reader.rows(table)
+            finally:
+                reader.close()
+        return self._read_file(path)
+
+    def _read_file(self, path):
+        with open(path, 'rb') as f:
+            return serializers.loads(f.read())
+
+    def _write_file(self, path, obj):
+        atomic_write(path, serializers.dumps(obj, self.serializer, self.compression))
+
+    def checkpoint(self):
+        """Compact the write journal into the snapshot file"""
+        with self._lock:
+            # Buffered journal lines are already applied in memory
+            self._journal_buffer = []
+            self.save()
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.journal_entries = 0
+
+    def column(self, table, field):
+        """Return one field of every record in `table`, in table order
+
+        A columnar table that has not been loaded yet is read straight from
+        the mapped file without building its records.
+        """
+        self._before_read()
+        if table in self._unloaded:
+            if self.layout == 'single':
+                return self._reader.column(table, field)
+            path = self._table_files()[table]
+            if is_columnar(path):
+                reader = ColumnarReader(path)
+                try:
+                    return reader.column(table, field)
+                finally:
+                    reader.close()
+        return super().column(table, field)
+
+    def to_frame(self, table, fields):
+        """Like StorageBackend.to_frame, but built from numpy arrays when possible
+
+        A columnar table that has not been loaded yet is turned into
+        arrays straight from the mapped file.
+        """
+        self._before_read()
+        if table in self._unloaded:
+            import pandas as pd
+            if self.layout == 'single':
+                return pd.DataFrame({field: self._reader.array(table, field) for field in fields}, columns=list(fields))
+            path = self._table_files()[table]
+            if is_columnar(path):
+                reader = ColumnarReader(path)
+                try:
+                    return pd.DataFrame({field: reader.array(table, field) for field in fields}, columns=list(fields))
+                finally:
+                    reader.close()
+        return super().to_frame(table, fields)
+
+    def _set_data(self, data):
+        self._unloaded = set()
+        super()._set_data(data)
+
+    def _rows(self, table):
+        if table in self._unloaded:
+            with self._lock:
+                if table in self._unloaded:
+                    self._load_table(table)
+        return self.tables.get(table, {})
+
+    def _load_table(self, table):
+        self._unloaded.discard(table)
+        if self.layout == 'split':
+            rows = self._read_table_file(table)
+        else:
+            rows = self._reader.rows(table)
+        self._add_rows(table, rows)
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _before_read(self):
+        if self.shared and not self._lock_depth:
+            self.refresh()
+
+    def _check_external_changes(self):
+        # A reload after another process's commit bumps the counters
+        self._before_read()
+
+    @contextmanager
+    def _write_guard(self):
+        # Holding the lock for a whole transaction keeps a background save
+        # from persisting half of it.
+        with self._lock, self._write_lock():
+            yield
+
+    def _commit(self, entries):
+        for entry in entries:
+            self._dirty.add(entry['table'])
+        self._write_entries(entries)
+        self._bump_version()
+
+    def _write_entries(self, entries):
+        if self.journal:
+            # A batch is a single journal line so a torn write drops all of it
+            if len(entries) == 1:
+                line = json.dumps(entries[0])
+            else:
+                line = json.dumps({"op": "batch", "entries": entries})
+            if self.save_delay is None:
+                self._append_journal([line])
+                return
+            self._journal_buffer.append(line)
+        elif self.save_delay is None:
+            self.save()
+            return
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self._background_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _background_flush(self):
+        with self._lock:
+            # flush() may have run while this thread waited for the lock
+            if self._timer is not threading.current_thread():
+                return
+            self._timer = None
+            self.flush()
+
+    def _append_journal(self, lines):
+        with open(self.journal_path, 'a') as f:
+            f.write(''.join(line + '\n' for line in lines))
+        self._journal_buffer = []
+        self.journal_entries += len(lines)
+        if self.journal_entries >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def _replay_journal(self):
+        self.journal_entries = 0
+        if not os.path.exists(self.journal_path):
+            return
+        complete = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    # Every append ends in a newline, so a line without one was cut short
+                    if not line.endswith(b'\n'):
+                        raise ValueError("unterminated line")
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append; everything
+                    # before it was written completely.
+                    break
+                self._apply(entry)
+                self.journal_entries += 1
+                complete += len(line)
+            torn = f.seek(0, os.SEEK_END) > complete
+        if torn:
+            # Cut the fragment off, or the next append would be glued onto it
+            # and that line, with every later one, lost on the next replay
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(complete)
+
+    def _apply(self, entry):
+        if entry['op'] == 'batch':
+            for sub_entry in entry['entries']:
+                self._apply(sub_entry)
+            return
+        table = entry['table']
+        self._dirty.add(table)
+        if entry['op'] == 'insert':
+            # A crash between writing the snapshot and removing the journal
+            # leaves entries that are already in the snapshot; skip those.
+            if entry['record']['id'] not in self._rows(table):
+                self._add_record(table, entry['record'])
+        elif entry['op'] == 'update':
+            record = self._rows(table).get(entry['id'])
+            if record is not None:
+                self._update_record(table, record, entry['fields'])
+        elif entry['op'] == 'delete':
+            self._remove_record(table, entry['id'])
 
     def close(self):
-        pass
+        with self._lock, self._write_lock():
+            self.flush()
+            if self.journal and self.journal_entries:
+                self.checkpoint()
+            self._close_reader()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
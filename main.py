@@ -1,8 +1,17 @@
-from json_database import Database
-from inventory import InventoryManager
-from maintenance import MaintenanceManager
-from reports import ReportGenerator
 import os
+import sys
+
+if __name__ == "__main__" and not __package__:
+    # Run as a script: import this directory as a package so the relative
+    # imports here and in the other modules resolve (PEP 366)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    __package__ = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+    __import__(__package__)
+
+from .json_database import JsonDatabase as Database
+from .inventory import InventoryManager
+from .maintenance import MaintenanceManager
+from .reports import ReportGenerator
 
 class VendingMachineSystem:
     def __init__(self):
@@ -25,6 +34,10 @@ class VendingMachineSystem:
         print("8. Generate Maintenance Report")
         print("9. Generate Low Stock Report")
         print("10. Visualize Inventory")
+        print("11. Import Restock Manifest")
+        print("12. Generate Sales Report")
+        print("13. Export Partitioned Report Dataset")
+        print("14. Generate All Reports")
         print("0. Exit")
         return input("Enter your choice: ")
     
@@ -219,6 +232,64 @@ class VendingMachineSystem:
         else:
             print("Invalid choice.")
     
+    def import_restock_manifest(self):
+        """Import a CSV or JSONL restock manifest"""
+        path = input("Enter manifest path (.csv or .jsonl): ").strip()
+        try:
+            self.inventory.import_restock_manifest(path)
+        except (OSError, ValueError) as e:
+            print(f"Could not import manifest: {e}")
+    
+    def generate_sales_report(self):
+        """Generate a sales report from the rollups"""
+        granularity = input("Granularity (hour/day/month, default: day): ").strip() or 'day'
+        by = input("Group by (product/building/machine, default: product): ").strip() or 'product'
+        start = input("Start date YYYY-MM-DD (optional): ").strip() or None
+        end = input("End date YYYY-MM-DD (optional): ").strip() or None
+        export = input("Export to CSV file? (y/n): ").lower() == 'y'
+        try:
+            self.reports.generate_sales_report(granularity, start, end, by, export)
+        except ValueError as e:
+            print(f"Invalid input: {e}")
+    
+    def export_partitioned_report(self):
+        """Export the inventory or maintenance report as a partitioned dataset"""
+        report = input("Report (inventory/maintenance, default: inventory): ").strip() or 'inventory'
+        format = input("Format (parquet/arrow, default: parquet): ").strip() or 'parquet'
+        incremental = input("Only add records not exported before? (y/n): ").lower() != 'n'
+        try:
+            self.reports.export_partitioned(report, format, incremental)
+        except (ImportError, ValueError) as e:
+            print(f"Could not export: {e}")
+    
+    def generate_all_reports(self):
+        """Generate every report and chart in parallel"""
+        threshold = input("Enter low stock threshold (default: 5): ")
+        try:
+            threshold = int(threshold) if threshold else 5
+        except ValueError:
+            print("Invalid input. Please enter a valid threshold.")
+            return
+        try:
+            self.reports.generate_all(threshold)
+        except Exception as e:
+            print(f"Could not generate reports: {e}")
+    
+    def serve_telemetry(self, host='127.0.0.1', port=8765, flush_interval=1.0):
+        """Apply telemetry events from the machines until interrupted with Ctrl+C"""
+        import asyncio
+        from .telemetry import TelemetryServer
+        server = TelemetryServer(self.db, host, port, flush_interval=flush_interval)
+        print(f"Listening for machine telemetry on {host}:{port}. Press Ctrl+C to stop.")
+        try:
+            # Interrupting cancels serve_forever, which applies pending events first
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.db.close()
+        print(f"Telemetry stopped: {server.stats()}")
+    
     def run(self):
         """Run the main application loop"""
         while True:
@@ -248,6 +319,14 @@ class VendingMachineSystem:
                 self.generate_low_stock_report()
             elif choice == '10':
                 self.visualize_inventory()
+            elif choice == '11':
+                self.import_restock_manifest()
+            elif choice == '12':
+                self.generate_sales_report()
+            elif choice == '13':
+                self.export_partitioned_report()
+            elif choice == '14':
+                self.generate_all_reports()
             else:
                 print("Invalid choice. Please try again.")
             
@@ -256,7 +335,25 @@ class VendingMachineSystem:
             os.system('cls' if os.name == 'nt' else 'clear')
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    """Run the menu, or with --telemetry the listener for machine telemetry"""
+    # Only needed when run as a script, so kept out of the import
+    import argparse
+    parser = argparse.ArgumentParser(description="Vending Machine Inventory Management System")
+    parser.add_argument("--telemetry", action="store_true",
+                        help="apply vend and restock events sent by the machines instead of showing the menu")
+    parser.add_argument("--host", default="127.0.0.1", help="telemetry address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="telemetry port to listen on (default: 8765)")
+    parser.add_argument("--flush-interval", type=float, default=1.0,
+                        help="seconds between telemetry commits (default: 1.0)")
+    args = parser.parse_args(argv)
     system = VendingMachineSystem()
-    system.run()
+    if args.telemetry:
+        system.serve_telemetry(args.host, args.port, args.flush_interval)
+    else:
+        system.run()
+
+
+if __name__ == "__main__":
+    main()
     
\ No newline at end of file
@@ -1,121 +1,408 @@
 # Ensure required packages are installed by running the following command in your terminal:
 # pip install pandas matplotlib
+# Both are imported inside the methods that use them, so starting the
+# application does not pay for them.
 from .json_database import JsonDatabase as Database
-import pandas as pd
-import matplotlib.pyplot as plt
+from .indexes import low_stock_index
+from .sales import SalesManager
+from .columnar_storage import replace_columnar
+import contextlib
+import csv
+import gzip
+import io
+import json
 import os
+import shutil
+import time
+from urllib.parse import quote
+
+INVENTORY_COLUMNS = ['Machine', 'Building', 'Product', 'Category', 'Quantity', 'Last Restock']
+MAINTENANCE_COLUMNS = ['Machine', 'Building', 'Date', 'Description', 'Performed By']
+
+# Rows printed to the console by a streamed export
+PREVIEW_ROWS = 10
+
+# Partitioned export format -> part file extension
+PARTITION_FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow'
+}
+
+# Report -> column whose month partitions its rows
+PARTITION_DATES = {
+    'inventory': 'Last Restock',
+    'maintenance': 'Date'
+}
+
+# Directory value for a missing building or date, as Hive and pyarrow spell it
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Tables each cached report or chart reads; it is rebuilt once one of them changes
+REPORT_TABLES = {
+    'inventory': ("inventory", "vending_machines", "buildings", "products"),
+    'maintenance': ("maintenance_records", "vending_machines", "buildings"),
+    'low_stock': ("inventory", "vending_machines", "buildings", "products"),
+    'inventory_by_machine': ("inventory", "vending_machines"),
+    'product_distribution': ("inventory", "products")
+}
+
+# Jobs run by generate_all(): name -> ReportGenerator method and its arguments
+ALL_REPORTS = {
+    'inventory': ('generate_inventory_report', {'export_csv': True}),
+    'maintenance': ('generate_maintenance_report', {'export_csv': True}),
+    'low_stock': ('generate_low_stock_report', {'export_csv': True}),
+    'inventory_by_machine': ('visualize_inventory_by_machine', {}),
+    'product_distribution': ('visualize_product_distribution', {})
+}
 
 class ReportGenerator:
     def __init__(self, db=None):
         """Initialize the report generator"""
         self.db = db if db else Database()
+        # Report DataFrames, CSV files and charts are cached with db.derived()
+        # against the tables listed in REPORT_TABLES. The DataFrames are handed
+        # to every caller, so treat them as read-only.
         os.makedirs('reports', exist_ok=True)
     
-    def generate_inventory_report(self, export_csv=False):
+    def generate_inventory_report(self, export_csv=False, stream=False, compress=False):
         """Generate inventory report for all machines"""
-        inventory = self.db.execute_query("inventory")
-        machines = {m['id']: m for m in self.db.execute_query("vending_machines")}
-        buildings = {b['id']: b for b in self.db.execute_query("buildings")}
-        products = {p['id']: p for p in self.db.execute_query("products")}
-        
-        data = []
-        for item in inventory:
-            machine = machines.get(item['machine_id'], {})
-            building = buildings.get(machine.get('building_id'), {})
-            product = products.get(item['product_id'], {})
-            data.append((
-                machine.get('name', ''),
-                building.get('name', ''),
-                product.get('name', ''),
-                product.get('category', ''),
-                item.get('quantity', 0),
-                item.get('last_restock_date', '')
-            ))
+        tables = REPORT_TABLES['inventory']
+        if stream:
+            return self._cached_file(self._csv_path('inventory_report', compress), tables, lambda: self.stream_csv(
+                'inventory_report', INVENTORY_COLUMNS, self._inventory_rows(), compress))
         
-        df = pd.DataFrame(data, columns=['Machine', 'Building', 'Product', 'Category', 'Quantity', 'Last Restock'])
+        df = self.db.derived(('report', 'inventory'), tables, self._inventory_frame)
         
         print("\n=== Inventory Report ===")
         print(df)
         
         if export_csv:
-            df.to_csv('reports/inventory_report.csv', index=False)
+            self._cached_file('reports/inventory_report.csv', tables,
+                              lambda: df.to_csv('reports/inventory_report.csv', index=False))
             print("Report exported to reports/inventory_report.csv")
         
         return df
     
-    def generate_maintenance_report(self, export_csv=False):
+    def generate_maintenance_report(self, export_csv=False, stream=False, compress=False):
         """Generate maintenance report"""
-        records = self.db.execute_query("maintenance_records")
-        machines = {m['id']: m for m in self.db.execute_query("vending_machines")}
-        buildings = {b['id']: b for b in self.db.execute_query("buildings")}
+        tables = REPORT_TABLES['maintenance']
+        if stream:
+            return self._cached_file(self._csv_path('maintenance_report', compress), tables, lambda: self.stream_csv(
+                'maintenance_report', MAINTENANCE_COLUMNS, self._maintenance_rows(), compress))
         
-        data = []
-        for r in records:
-            machine = machines.get(r['machine_id'], {})
-            building = buildings.get(machine.get('building_id'), {})
-            data.append((
-                machine.get('name', ''),
-                building.get('name', ''),
-                r['maintenance_date'],
-                r['description'],
-                r['performed_by']
-            ))
-        
-        df = pd.DataFrame(data, columns=['Machine', 'Building', 'Date', 'Description', 'Performed By'])
+        df = self.db.derived(('report', 'maintenance'), tables, self._maintenance_frame)
         
         print("\n=== Maintenance Report ===")
         print(df)
         
         if export_csv:
-            df.to_csv('reports/maintenance_report.csv', index=False)
+            self._cached_file('reports/maintenance_report.csv', tables,
+                              lambda: df.to_csv('reports/maintenance_report.csv', index=False))
             print("Report exported to reports/maintenance_report.csv")
         
         return df
     
-    def generate_low_stock_report(self, threshold=5, export_csv=False):
+    def generate_low_stock_report(self, threshold=5, export_csv=False, stream=False, compress=False):
         """Generate report of low stock items"""
-        inventory = self.db.execute_query("inventory")
-        machines = {m['id']: m for m in self.db.execute_query("vending_machines")}
-        buildings = {b['id']: b for b in self.db.execute_query("buildings")}
-        products = {p['id']: p for p in self.db.execute_query("products")}
-        
-        data = []
-        for item in inventory:
-            if item['quantity'] <= threshold:
-                machine = machines.get(item['machine_id'], {})
-                building = buildings.get(machine.get('building_id'), {})
-                product = products.get(item['product_id'], {})
-                data.append((
-                    machine.get('name', ''),
-                    building.get('name', ''),
-                    product.get('name', ''),
-                    product.get('category', ''),
-                    item['quantity'],
-                    item['last_restock_date']
-                ))
-        
-        df = pd.DataFrame(data, columns=['Machine', 'Building', 'Product', 'Category', 'Quantity', 'Last Restock'])
+        tables = REPORT_TABLES['low_stock']
+        if stream:
+            return self._cached_file(self._csv_path('low_stock_report', compress), tables, lambda: self.stream_csv(
+                'low_stock_report', INVENTORY_COLUMNS, self._low_stock_rows(threshold), compress), threshold)
+        
+        def build():
+            import pandas as pd
+            return pd.DataFrame(list(self._low_stock_rows(threshold)), columns=INVENTORY_COLUMNS)
+        df = self.db.derived(('report', 'low_stock', threshold), tables, build)
         
         print(f"\n=== Low Stock Report (Threshold: {threshold}) ===")
         print(df)
         
         if export_csv:
-            df.to_csv('reports/low_stock_report.csv', index=False)
+            self._cached_file('reports/low_stock_report.csv', tables,
+                              lambda: df.to_csv('reports/low_stock_report.csv', index=False), threshold)
             print("Report exported to reports/low_stock_report.csv")
         
         return df
     
-    def visualize_inventory_by_machine(self):
-        """Create a bar chart of product counts by machine"""
-        inventory = self.db.execute_query("inventory")
-        machines = {m['id']: m for m in self.db.execute_query("vending_machines")}
+    def stream_csv(self, name, columns, rows, compress=False, preview=PREVIEW_ROWS):
+        """Write rows to reports/<name>.csv as they are produced and return the path
+        
+        Only one row is held at a time and only the first `preview` rows
+        are printed. compress=True writes reports/<name>.csv.gz instead.
+        The generate_*_report methods write through here when called with
+        stream=True, skipping the DataFrame.
+        """
+        path = self._csv_path(name, compress)
+        opener = gzip.open if compress else open
+        count = 0
+        
+        print(f"\n=== {name.replace('_', ' ').title()} ===")
+        print(" | ".join(columns))
+        with opener(path, 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                if count < preview:
+                    print(" | ".join(str(value) for value in row))
+                count += 1
+        
+        if count > preview:
+            print(f"... {count - preview} more rows")
+        print(f"{count} rows exported to {path}")
+        return path
+    
+    def generate_all(self, threshold=5, max_workers=None):
+        """Run every report and chart in ALL_REPORTS at once in a process pool
+        
+        The tables they read are copied once, at a single point in time,
+        into a columnar snapshot file that every worker maps, so all outputs
+        describe the same data however long the job runs. Each worker writes
+        into a staging directory and its files are renamed into reports/
+        when it finishes, so readers never see a half-written file.
+        
+        A report that fails leaves its old output in place without stopping
+        the others. Returns (timings, failures): seconds per report plus
+        'snapshot' and 'total', and the error message of each failed report.
+        """
+        # Imported here: it pulls in multiprocessing, which slows startup
+        from concurrent.futures import ProcessPoolExecutor
+        start = time.perf_counter()
+        staging = os.path.abspath(f'reports/.staging-{os.getpid()}')
+        os.makedirs(staging, exist_ok=True)
+        timings = {}
+        failures = {}
+        try:
+            tables = sorted({table for name in ALL_REPORTS for table in REPORT_TABLES[name]})
+            snapshot_path = os.path.join(staging, 'snapshot.vdb')
+            replace_columnar(snapshot_path, self.db.snapshot(tables))
+            timings['snapshot'] = time.perf_counter() - start
+            
+            with ProcessPoolExecutor(max_workers or min(len(ALL_REPORTS), os.cpu_count() or 1)) as pool:
+                futures = {}
+                for name, (method, kwargs) in ALL_REPORTS.items():
+                    if name == 'low_stock':
+                        kwargs = dict(kwargs, threshold=threshold)
+                    futures[name] = pool.submit(_run_report, snapshot_path, os.path.join(staging, name), method, kwargs)
+                for name, future in futures.items():
+                    try:
+                        timings[name] = future.result()
+                    except Exception as e:
+                        failures[name] = f"{type(e).__name__}: {e}"
+                        print(f"{name}: failed: {failures[name]}")
+                        continue
+                    output = os.path.join(staging, name, 'reports')
+                    for filename in sorted(os.listdir(output)):
+                        os.replace(os.path.join(output, filename), os.path.join('reports', filename))
+                        print(f"{name}: reports/{filename} ({timings[name]:.2f}s)")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        
+        timings['total'] = time.perf_counter() - start
+        done = len(ALL_REPORTS) - len(failures)
+        print(f"{done} of {len(ALL_REPORTS)} reports generated in {timings['total']:.2f}s "
+              f"(snapshot {timings['snapshot']:.2f}s)")
+        return timings, failures
+    
+    def _cached_file(self, path, tables, write, *params):
+        """Run write() to produce the file at `path` unless it is already current; return the path
+        
+        The file is written again once one of `tables` changes, when called
+        with other `params`, or if it has been deleted.
+        """
+        def build():
+            write()
+            return path
+        return self.db.derived(('report file', path), tables, build, params, os.path.exists)
+    
+    def _chart(self, path, tables, draw):
+        """Run draw(path) to draw and save a chart, or show the saved PNG while still current
+        
+        draw() returns the path it saved to, or None if there was nothing to chart.
+        """
+        drawn = []
         
-        totals = {}
-        for item in inventory:
-            machine_name = machines.get(item['machine_id'], {}).get('name', 'Unknown Machine')
-            totals[machine_name] = totals.get(machine_name, 0) + item['quantity']
+        def build():
+            drawn.append(path)
+            return draw(path)
+        self.db.derived(('report file', path), tables, build,
+                        check=lambda saved: saved is not None and os.path.exists(saved))
+        if not drawn:
+            self._show_saved_chart(path)
+    
+    def _csv_path(self, name, compress=False):
+        return f'reports/{name}.csv' + ('.gz' if compress else '')
+    
+    def export_partitioned(self, report, format='parquet', incremental=True):
+        """Write the inventory or maintenance report as a partitioned dataset
+        
+        Rows go to reports/<report>_dataset/building=<name>/month=<YYYY-MM>/
+        in Parquet or Arrow IPC (Feather) part files, so pyarrow.dataset or
+        pd.read_parquet(..., filters=...) can read just the partitions they
+        need. Exports only ever add files: with incremental=True only
+        records with an id above the one saved in _watermark.json by the
+        previous export are written. Changes to records exported before are
+        not picked up; incremental=False deletes the dataset and writes
+        everything again. Needs the pyarrow package.
+        """
+        if report not in PARTITION_DATES:
+            raise ValueError(f"Unknown partitioned report: {report}")
+        if format not in PARTITION_FORMATS:
+            raise ValueError(f"Unknown export format: {format}")
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Partitioned exports need the pyarrow package (pip install pyarrow)") from None
+        
+        root = f'reports/{report}_dataset'
+        watermark_path = os.path.join(root, '_watermark.json')
+        if not incremental:
+            shutil.rmtree(root, ignore_errors=True)
+        watermark = {"format": format, "last_id": 0}
+        if os.path.exists(watermark_path):
+            with open(watermark_path, encoding='utf-8') as f:
+                watermark = json.load(f)
+            if watermark['format'] != format:
+                raise ValueError(f"{root} holds {watermark['format']} files; "
+                                 f"export it with incremental=False to switch to {format}")
         
-        df = pd.DataFrame(list(totals.items()), columns=['Machine', 'Total Items'])
+        frame = self._inventory_frame if report == 'inventory' else self._maintenance_frame
+        df = frame(after=watermark['last_id'])
+        files = []
+        if len(df):
+            first_id, last_id = int(df['id'].min()), int(df['id'].max())
+            month = df[PARTITION_DATES[report]].astype(str).str[:7]
+            df['month'] = month.where(month.str.fullmatch(r'\d{4}-\d{2}'), NULL_PARTITION)
+            df['building'] = df['Building'].map(lambda name: quote(name, safe='') if name else NULL_PARTITION)
+            
+            for (building, month), part in df.groupby(['building', 'month'], sort=True):
+                directory = os.path.join(root, f'building={building}', f'month={month}')
+                os.makedirs(directory, exist_ok=True)
+                # Named by id range, so a retried export replaces its own files
+                path = os.path.join(directory, f'part-{first_id:010d}-{last_id:010d}{PARTITION_FORMATS[format]}')
+                part = part.drop(columns=['id', 'building', 'month']).reset_index(drop=True)
+                # Written under a temporary name so readers never see half a file
+                partial = path + '.tmp'
+                if format == 'parquet':
+                    part.to_parquet(partial, index=False)
+                else:
+                    part.to_feather(partial)
+                os.replace(partial, path)
+                files.append(path)
+            
+            # Saved last: an interrupted export is redone in full next time
+            watermark = {"format": format, "last_id": last_id}
+            os.makedirs(root, exist_ok=True)
+            with open(watermark_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(watermark, f)
+            os.replace(watermark_path + '.tmp', watermark_path)
+        
+        print(f"{len(df)} rows exported to {len(files)} {format} files under {root}")
+        return {"rows": len(df), "files": files, "last_id": watermark['last_id']}
+    
+    def _dimension(self, table, columns):
+        # `table` as a frame with its fields renamed by `columns`, ready to merge
+        return self.db.to_frame(table, list(columns)).rename(columns=columns)
+    
+    def _inventory_frame(self, after=None):
+        """Inventory joined to machine, building and product names with vectorized merges
+        
+        Given `after`, only records with a larger id, with the id kept as a column.
+        """
+        df = self.db.to_frame("inventory", ['id', 'machine_id', 'product_id', 'quantity', 'last_restock_date'])
+        if after is not None:
+            df = df[df['id'] > after]
+        df = df.merge(self._dimension("vending_machines", {'id': 'machine_id', 'name': 'Machine', 'building_id': 'building_id'}),
+                      on='machine_id', how='left')
+        df = df.merge(self._dimension("buildings", {'id': 'building_id', 'name': 'Building'}), on='building_id', how='left')
+        df = df.merge(self._dimension("products", {'id': 'product_id', 'name': 'Product', 'category': 'Category'}),
+                      on='product_id', how='left')
+        df = df.rename(columns={'quantity': 'Quantity', 'last_restock_date': 'Last Restock'})
+        df[['Machine', 'Building', 'Product', 'Category']] = df[['Machine', 'Building', 'Product', 'Category']].fillna('')
+        return df[INVENTORY_COLUMNS if after is None else ['id'] + INVENTORY_COLUMNS]
+    
+    def _maintenance_frame(self, after=None):
+        """Maintenance records joined to machine and building names with vectorized merges
+        
+        Given `after`, only records with a larger id, with the id kept as a column.
+        """
+        df = self.db.to_frame("maintenance_records", ['id', 'machine_id', 'maintenance_date', 'description', 'performed_by'])
+        if after is not None:
+            df = df[df['id'] > after]
+        df = df.merge(self._dimension("vending_machines", {'id': 'machine_id', 'name': 'Machine', 'building_id': 'building_id'}),
+                      on='machine_id', how='left')
+        df = df.merge(self._dimension("buildings", {'id': 'building_id', 'name': 'Building'}), on='building_id', how='left')
+        df = df.rename(columns={'maintenance_date': 'Date', 'description': 'Description', 'performed_by': 'Performed By'})
+        df[['Machine', 'Building']] = df[['Machine', 'Building']].fillna('')
+        return df[MAINTENANCE_COLUMNS if after is None else ['id'] + MAINTENANCE_COLUMNS]
+    
+    def _inventory_rows(self):
+        machines = self.db.lookup("vending_machines")
+        buildings = self.db.lookup("buildings")
+        products = self.db.lookup("products")
+        
+        for item in self.db.iter_query("inventory"):
+            machine = machines.get(item['machine_id'], {})
+            building = buildings.get(machine.get('building_id'), {})
+            product = products.get(item['product_id'], {})
+            yield (
+                machine.get('name', ''),
+                building.get('name', ''),
+                product.get('name', ''),
+                product.get('category', ''),
+                item.get('quantity', 0),
+                item.get('last_restock_date', '')
+            )
+    
+    def _maintenance_rows(self):
+        machines = self.db.lookup("vending_machines")
+        buildings = self.db.lookup("buildings")
+        
+        for r in self.db.iter_query("maintenance_records"):
+            machine = machines.get(r['machine_id'], {})
+            building = buildings.get(machine.get('building_id'), {})
+            yield (
+                machine.get('name', ''),
+                building.get('name', ''),
+                r['maintenance_date'],
+                r['description'],
+                r['performed_by']
+            )
+    
+    def _low_stock_rows(self, threshold):
+        machines = self.db.lookup("vending_machines")
+        buildings = self.db.lookup("buildings")
+        products = self.db.lookup("products")
+        
+        for inventory_id, machine_id, product_id, quantity in low_stock_index(self.db).below(threshold):
+            item = self.db.get_by_id("inventory", inventory_id)
+            machine = machines.get(machine_id, {})
+            building = buildings.get(machine.get('building_id'), {})
+            product = products.get(product_id, {})
+            yield (
+                machine.get('name', ''),
+                building.get('name', ''),
+                product.get('name', ''),
+                product.get('category', ''),
+                quantity,
+                item['last_restock_date']
+            )
+    
+    def visualize_inventory_by_machine(self):
+        """Create a bar chart of product counts by machine"""
+        self._chart('reports/inventory_by_machine.png', REPORT_TABLES['inventory_by_machine'],
+                    self._draw_inventory_by_machine)
+    
+    def _draw_inventory_by_machine(self, path):
+        import pandas as pd
+        import matplotlib.pyplot as plt
+        inventory = self.db.to_frame("inventory", ['machine_id', 'quantity'])
+        # An empty or partly null column comes back with object dtype
+        inventory['quantity'] = pd.to_numeric(inventory['quantity']).fillna(0)
+        inventory = inventory.merge(self._dimension("vending_machines", {'id': 'machine_id', 'name': 'Machine'}),
+                                    on='machine_id', how='left')
+        inventory['Machine'] = inventory['Machine'].fillna('Unknown Machine')
+        df = inventory.groupby('Machine', sort=False)['quantity'].sum().reset_index(name='Total Items')
         
         plt.figure(figsize=(10, 6))
         plt.bar(df['Machine'], df['Total Items'], color='skyblue')
@@ -125,28 +412,103 @@ class ReportGenerator:
         plt.xticks(rotation=45)
         plt.tight_layout()
         
-        plt.savefig('reports/inventory_by_machine.png')
-        print("Chart saved to reports/inventory_by_machine.png")
+        plt.savefig(path)
+        print(f"Chart saved to {path}")
         plt.show()
+        return path
     
     def visualize_product_distribution(self):
         """Create a pie chart of product category distribution"""
-        inventory = self.db.execute_query("inventory")
-        products = {p['id']: p for p in self.db.execute_query("products")}
-        
-        totals = {}
-        for item in inventory:
-            product = products.get(item['product_id'], {})
-            category = product.get('category', 'Other')
-            totals[category] = totals.get(category, 0) + item['quantity']
-        
-        df = pd.DataFrame(list(totals.items()), columns=['Category', 'Quantity'])
+        self._chart('reports/product_distribution.png', REPORT_TABLES['product_distribution'],
+                    self._draw_product_distribution)
+    
+    def _draw_product_distribution(self, path):
+        import pandas as pd
+        import matplotlib.pyplot as plt
+        inventory = self.db.to_frame("inventory", ['product_id', 'quantity'])
+        # An empty or partly null column comes back with object dtype
+        inventory['quantity'] = pd.to_numeric(inventory['quantity']).fillna(0)
+        inventory = inventory.merge(self._dimension("products", {'id': 'product_id', 'category': 'Category'}),
+                                    on='product_id', how='left')
+        inventory['Category'] = inventory['Category'].fillna('Other')
+        df = inventory.groupby('Category', sort=False)['quantity'].sum().reset_index(name='Quantity')
+        if not df['Quantity'].sum():
+            print("No stock to chart")
+            return None
         
         plt.figure(figsize=(8, 8))
         plt.pie(df['Quantity'], labels=df['Category'], autopct='%1.1f%%', startangle=90, shadow=True)
         plt.title('Product Distribution by Category')
         plt.axis('equal')
         
-        plt.savefig('reports/product_distribution.png')
-        print("Chart saved to reports/product_distribution.png")
+        plt.savefig(path)
+        print(f"Chart saved to {path}")
         plt.show()
+        return path
+    
+    def _show_saved_chart(self, path):
+        """Display a chart saved while its tables were unchanged, instead of drawing it again"""
+        import matplotlib.pyplot as plt
+        image = plt.imread(path)
+        # Same size as the saved figure, with nothing around the image
+        plt.figure(figsize=(image.shape[1] / 100, image.shape[0] / 100), dpi=100)
+        plt.axes((0, 0, 1, 1))
+        plt.imshow(image)
+        plt.axis('off')
+        print(f"Chart at {path} is up to date")
+        plt.show()
+    
+    def generate_sales_report(self, granularity='day', start=None, end=None, by='product', export_csv=False):
+        """Generate units and revenue per period, read from the sales rollups"""
+        import pandas as pd
+        rows = SalesManager(self.db).get_sales(granularity, start, end, group_by=(by,))
+        df = pd.DataFrame(rows, columns=['Period', by.title(), 'Units', 'Revenue'])
+        
+        print(f"\n=== Sales Report ({granularity} by {by}) ===")
+        print(df)
+        
+        if export_csv:
+            path = f'reports/sales_{granularity}_by_{by}.csv'
+            df.to_csv(path, index=False)
+            print(f"Report exported to {path}")
+        
+        return df
+    
+    def visualize_sales_trend(self, granularity='day', start=None, end=None):
+        """Create a line chart of units sold per period"""
+        import pandas as pd
+        import matplotlib.pyplot as plt
+        rows = SalesManager(self.db).get_sales(granularity, start, end, group_by=())
+        df = pd.DataFrame(rows, columns=['Period', 'Units', 'Revenue'])
+        
+        plt.figure(figsize=(10, 6))
+        plt.plot(df['Period'], df['Units'], marker='o')
+        plt.title(f'Units Sold per {granularity.title()}')
+        plt.xlabel(granularity.title())
+        plt.ylabel('Units Sold')
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        
+        plt.savefig('reports/sales_trend.png')
+        print("Chart saved to reports/sales_trend.png")
+        plt.show()
+
+
+def _run_report(snapshot_path, workdir, method, kwargs):
+    """generate_all() worker: run one ReportGenerator method on the snapshot
+
+    Outputs land in workdir/reports/. Returns the seconds it took.
+    """
+    start = time.perf_counter()
+    import matplotlib
+    # No windows from a worker; plt.show() does nothing with Agg
+    matplotlib.use('Agg')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    db = Database(snapshot_path, storage_format='columnar')
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            getattr(ReportGenerator(db), method)(**kwargs)
+    finally:
+        db.close()
+    return time.perf_counter() - start
@@ -0,0 +1,130 @@
+from .json_database import JsonDatabase as Database
+from .indexes import sales_rollup_index
+from datetime import datetime
+
+# Rollup granularity -> length of the period key cut from an ISO timestamp,
+# e.g. '2024-05-01T13' for an hour, '2024-05-01' for a day, '2024-05' for a month
+GRANULARITIES = {
+    'hour': 13,
+    'day': 10,
+    'month': 7
+}
+
+# Rollup fields sales can be grouped by, with the lookup table naming them
+GROUP_FIELDS = {
+    'machine': ('machine_id', 'vending_machines'),
+    'product': ('product_id', 'products'),
+    'building': ('building_id', 'buildings')
+}
+
+
+def period_range(granularity, start=None, end=None):
+    """Turn ISO date or timestamp bounds into inclusive (low, high) period bounds
+
+    An end date keeps every hour of that day; a missing bound is None.
+    """
+    width = GRANULARITIES[granularity]
+    # '~' sorts after digits and 'T', so longer periods on the end day match
+    return (start[:width] if start else None), (end[:width] + '~' if end else None)
+
+
+class SalesManager:
+    def __init__(self, db=None):
+        """Initialize the sales manager"""
+        self.db = db if db else Database()
+
+    def record_sale(self, machine_id, product_id, quantity=1, sold_at=None, price=None):
+        """Log a vend and add it to the hourly, daily and monthly rollups"""
+        return self.record_sales([(machine_id, product_id, quantity, sold_at, price)])[0]
+
+    def record_sales(self, sales):
+        """Log many (machine_id, product_id, quantity, sold_at, price) vends
+
+        sold_at defaults to now and price to the product's current price;
+        tuples may stop after quantity. The events and their rollup changes
+        are written in one transaction, and each rollup row touched by the
+        batch is updated once. Returns the new sale ids.
+        """
+        machines = self.db.lookup("vending_machines")
+        products = self.db.lookup("products")
+        now = datetime.now().isoformat(timespec='seconds')
+        events = []
+        for sale in sales:
+            machine_id, product_id, quantity, sold_at, price = (tuple(sale) + (None, None))[:5]
+            if machine_id not in machines:
+                raise ValueError(f"Unknown machine: {machine_id}")
+            if product_id not in products:
+                raise ValueError(f"Unknown product: {product_id}")
+            if price is None:
+                price = products[product_id]['price']
+            events.append({
+                "machine_id": machine_id,
+                "product_id": product_id,
+                "building_id": machines[machine_id].get('building_id'),
+                "quantity": quantity,
+                "revenue": round(price * quantity, 2),
+                "sold_at": sold_at or now
+            })
+
+        with self.db.transaction():
+            sale_ids = self.db.execute_many("sales", events)
+            self._add_to_rollups(events)
+        return sale_ids
+
+    def rebuild_rollups(self):
+        """Recompute every rollup from the sales log"""
+        with self.db.transaction():
+            for rollup in self.db.execute_query("sales_rollups"):
+                self.db.execute_delete("sales_rollups", rollup['id'])
+            self._add_to_rollups(self.db.execute_query("sales"))
+
+    def _add_to_rollups(self, events):
+        totals = {}
+        for event in events:
+            for granularity, width in GRANULARITIES.items():
+                key = (granularity, event['sold_at'][:width], event['machine_id'], event['product_id'])
+                total = totals.setdefault(key, [event['building_id'], 0, 0.0])
+                total[1] += event['quantity']
+                total[2] += event['revenue']
+
+        rollups = sales_rollup_index(self.db)
+        for (granularity, period, machine_id, product_id), (building_id, units, revenue) in totals.items():
+            rollup = rollups.find(granularity, period, machine_id, product_id)
+            if rollup is not None:
+                self.db.execute_update("sales_rollups", rollup['id'], {
+                    "units": rollup['units'] + units,
+                    "revenue": round(rollup['revenue'] + revenue, 2)
+                })
+            else:
+                self.db.execute_insert("sales_rollups", {
+                    "granularity": granularity,
+                    "period": period,
+                    "machine_id": machine_id,
+                    "product_id": product_id,
+                    "building_id": building_id,
+                    "units": units,
+                    "revenue": round(revenue, 2)
+                })
+
+    def get_sales(self, granularity='day', start=None, end=None, group_by=('product',)):
+        """Total units and revenue per period and group from the rollups
+
+        group_by names any of 'machine', 'product' and 'building'. Returns
+        (period, *group names, units, revenue) tuples sorted by period and
+        then by name.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        for group in group_by:
+            if group not in GROUP_FIELDS:
+                raise ValueError(f"Unknown sales grouping: {group}")
+        fields = [GROUP_FIELDS[group][0] for group in group_by]
+        names = [self.db.lookup(GROUP_FIELDS[group][1]) for group in group_by]
+        totals = {}
+        for rollup in sales_rollup_index(self.db).scan(granularity, *period_range(granularity, start, end)):
+            key = (rollup['period'],) + tuple(lookup.get(rollup[field], {}).get('name', '')
+                                              for lookup, field in zip(names, fields))
+            total = totals.setdefault(key, [0, 0.0])
+            total[0] += rollup['units'] or 0
+            total[1] += rollup['revenue'] or 0
+        return [key + (units, round(revenue, 2)) for key, (units, revenue) in sorted(totals.items())]
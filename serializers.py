@@ -0,0 +1,129 @@
+import bz2
+import gzip
+import importlib
+import json
+import lzma
+
+# Optional encoders and compressors; each one is only needed if selected.
+# pip install orjson msgpack zstandard
+# They are imported on first use so loading this module stays cheap.
+_optional_modules = {}
+
+
+def _optional(name):
+    """Return the optional module `name`, or None if it is not installed"""
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+# Leading bytes used to recognise compressed files on load
+COMPRESSION_MAGIC = {
+    'gzip': b'\x1f\x8b',
+    'zstd': b'\x28\xb5\x2f\xfd',
+    'xz': b'\xfd7zXZ\x00',
+    'bz2': b'BZh'
+}
+
+SERIALIZERS = ('json', 'compact', 'fast', 'msgpack')
+COMPRESSIONS = (None,) + tuple(COMPRESSION_MAGIC)
+
+
+def available_serializers():
+    """Serializers usable with the packages installed here"""
+    return [name for name in SERIALIZERS if name != 'msgpack' or _optional('msgpack') is not None]
+
+
+def available_compressions():
+    """Compressions usable with the packages installed here"""
+    return [name for name in COMPRESSIONS if name != 'zstd' or _optional('zstandard') is not None]
+
+
+def check_options(serializer, compression):
+    """Raise ValueError/ImportError early for an unusable configuration"""
+    if serializer not in SERIALIZERS:
+        raise ValueError(f"Unknown serializer: {serializer}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if serializer == 'msgpack' and _optional('msgpack') is None:
+        raise ImportError("The msgpack serializer needs the msgpack package (pip install msgpack)")
+    if compression == 'zstd' and _optional('zstandard') is None:
+        raise ImportError("zstd compression needs the zstandard package (pip install zstandard)")
+
+
+def encode(obj, serializer='json'):
+    if serializer == 'json':
+        return json.dumps(obj, indent=4).encode('utf-8')
+    if serializer == 'compact':
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    if serializer == 'fast':
+        # orjson when installed, otherwise the compact stdlib encoding
+        orjson = _optional('orjson')
+        if orjson is not None:
+            return orjson.dumps(obj)
+        return encode(obj, 'compact')
+    if serializer == 'msgpack':
+        return _optional('msgpack').packb(obj, use_bin_type=True)
+    raise ValueError(f"Unknown serializer: {serializer}")
+
+
+def compress(raw, compression=None):
+    if compression is None:
+        return raw
+    if compression == 'gzip':
+        # mtime=0 keeps output identical for identical data
+        return gzip.compress(raw, compresslevel=6, mtime=0)
+    if compression == 'zstd':
+        return _optional('zstandard').ZstdCompressor(level=3).compress(raw)
+    if compression == 'xz':
+        return lzma.compress(raw, preset=1)
+    if compression == 'bz2':
+        return bz2.compress(raw)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def dumps(obj, serializer='json', compression=None):
+    """Encode `obj` to bytes with the given serializer and compression"""
+    return compress(encode(obj, serializer), compression)
+
+
+def detect_compression(raw):
+    for name, magic in COMPRESSION_MAGIC.items():
+        if raw.startswith(magic):
+            return name
+    return None
+
+
+def decompress(raw):
+    compression = detect_compression(raw)
+    if compression == 'gzip':
+        return gzip.decompress(raw)
+    if compression == 'zstd':
+        zstandard = _optional('zstandard')
+        if zstandard is None:
+            raise ImportError("Reading zstd data needs the zstandard package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+    if compression == 'xz':
+        return lzma.decompress(raw)
+    if compression == 'bz2':
+        return bz2.decompress(raw)
+    return raw
+
+
+def loads(raw):
+    """Decode bytes written by dumps(), detecting compression and format"""
+    raw = decompress(raw)
+    head = raw[:1]
+    if head.isspace():
+        head = raw.lstrip()[:1]
+    if head in (b'{', b'['):
+        orjson = _optional('orjson')
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
+    msgpack = _optional('msgpack')
+    if msgpack is None:
+        raise ImportError("Reading msgpack data needs the msgpack package (pip install msgpack)")
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)
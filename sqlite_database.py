@@ -0,0 +1,197 @@
+from contextlib import contextmanager
+
+from .src.database import Database
+from .storage import ConflictError, StorageBackend, parse_criteria
+
+# SQL for each execute_query filter operator
+SQL_OPERATORS = {
+    'eq': '=',
+    'ne': '!=',
+    'lt': '<',
+    'le': '<=',
+    'gt': '>',
+    'ge': '>=',
+    'in': 'IN'
+}
+
+
+class SqliteDatabase(StorageBackend):
+    """Table API over the SQLite schema in src/database.py
+
+    Filters and joins are turned into SQL so they run on the database's
+    indexes. Pass an already open src.database.Database (for example a
+    PooledDatabase) as `sql` to share its connection.
+    """
+
+    def __init__(self, db_path='data/vending.db', sql=None):
+        super().__init__()
+        self.sql = sql if sql else Database(db_path)
+        self.version = 0
+        self._columns = {}
+        # Last PRAGMA data_version seen on each connection; the values of
+        # different connections (e.g. a PooledDatabase's threads) don't compare
+        self._data_versions = {}
+
+    def _check_external_changes(self):
+        # data_version changes whenever another connection commits
+        conn = self.sql.conn
+        data_version = self.sql.execute_query("PRAGMA data_version")[0][0]
+        last = self._data_versions.get(conn)
+        if data_version != last:
+            # A connection seen for the first time can't tell what it missed
+            if last is not None or self._data_versions:
+                self._touch_all()
+            self._data_versions[conn] = data_version
+
+    def _table_columns(self, table):
+        """Column names of `table`; doubles as the check on identifiers"""
+        columns = self._columns.get(table)
+        if columns is None:
+            rows = self.sql.execute_query(f'PRAGMA table_info("{table.replace(chr(34), "")}")')
+            if not rows:
+                raise ValueError(f"Unknown table: {table}")
+            columns = self._columns[table] = [row[1] for row in rows]
+        return columns
+
+    def _check_fields(self, table, fields):
+        columns = self._table_columns(table)
+        for field in fields:
+            if field not in columns:
+                raise ValueError(f"Unknown column {field} in table {table}")
+
+    def _where(self, table, criteria, alias=None):
+        predicates = parse_criteria(criteria)
+        self._check_fields(table, [field for field, _, _ in predicates])
+        prefix = f"{alias}." if alias else ""
+        clauses = []
+        params = []
+        for field, op, value in predicates:
+            if op == 'in':
+                clauses.append(f"{prefix}{field} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{prefix}{field} {SQL_OPERATORS[op]} ?")
+                params.append(value)
+        if not clauses:
+            return "", params
+        return " WHERE " + " AND ".join(clauses), params
+
+    def _records(self, table, rows):
+        columns = self._table_columns(table)
+        return [dict(zip(columns, row)) for row in rows]
+
+    def execute_query(self, table, filter_fn=None, **criteria):
+        where, params = self._where(table, criteria)
+        columns = ', '.join(self._table_columns(table))
+        records = self._records(table, self.sql.execute_query(f"SELECT {columns} FROM {table}{where} ORDER BY id", params))
+        if filter_fn:
+            records = list(filter(filter_fn, records))
+        return records
+
+    def iter_query(self, table, **criteria):
+        where, params = self._where(table, criteria)
+        columns = self._table_columns(table)
+        for row in self.sql.iter_query(f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY id", params):
+            yield dict(zip(columns, row))
+
+    def get_by_id(self, table, record_id):
+        records = self.execute_query(table, id=record_id)
+        return records[0] if records else None
+
+    def column(self, table, field):
+        self._check_fields(table, [field])
+        return [row[0] for row in self.sql.execute_query(f"SELECT {field} FROM {table} ORDER BY id")]
+
+    def to_frame(self, table, fields):
+        import pandas as pd
+        self._check_fields(table, fields)
+        # Straight from the cursor into columns, without per-row dicts
+        return pd.read_sql_query(f"SELECT {', '.join(fields)} FROM {table} ORDER BY id", self.sql.conn)
+
+    def snapshot(self, tables):
+        if self.sql.batch_depth:
+            return super().snapshot(tables)
+        # Outside a transaction every SELECT sees the latest commit, so hold
+        # one read transaction open across all of them
+        self.sql.execute_query("BEGIN")
+        try:
+            return {table: self.execute_query(table) for table in tables}
+        finally:
+            self.sql.conn.rollback()
+
+    def execute_join(self, table, join_table, foreign_key, **criteria):
+        self._check_fields(table, [foreign_key])
+        left = self._table_columns(table)
+        right = self._table_columns(join_table)
+        where, params = self._where(table, criteria, alias='t')
+        select = ', '.join([f"t.{c}" for c in left] + [f"j.{c}" for c in right])
+        rows = self.sql.execute_query(
+            f"SELECT {select} FROM {table} t LEFT JOIN {join_table} j ON t.{foreign_key} = j.id{where} ORDER BY t.id",
+            params)
+        result = []
+        for row in rows:
+            joined = dict(zip(right, row[len(left):]))
+            result.append((dict(zip(left, row[:len(left)])), joined if joined['id'] is not None else None))
+        return result
+
+    @contextmanager
+    def transaction(self, expected_version=None):
+        # The version only tracks commits made through this object
+        if expected_version is not None and expected_version != self.version:
+            raise ConflictError(f"Expected version {expected_version}, found {self.version}")
+        outermost = not self.sql.batch_depth
+        try:
+            with self.sql.batch():
+                yield self
+        except BaseException:
+            # Lookups cached mid-transaction may hold rolled back rows
+            if outermost:
+                self._touch_all()
+            raise
+        if outermost:
+            self.version += 1
+
+    def _changed(self, table):
+        self._touch(table)
+        if not self.sql.batch_depth:
+            self.version += 1
+
+    def execute_insert(self, table, record):
+        fields = [f for f in record if f != 'id']
+        self._check_fields(table, fields)
+        record['id'] = self.sql.execute_insert(
+            f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+            [record[f] for f in fields])
+        self._changed(table)
+        if table in self._listeners:
+            self._notify(table, None, self.get_by_id(table, record['id']))
+        return record['id']
+
+    def execute_update(self, table, record_id, update_fields):
+        if not update_fields:
+            return self.get_by_id(table, record_id) is not None
+        self._check_fields(table, update_fields)
+        # Listeners get whole rows, which costs a read before and after
+        old = self.get_by_id(table, record_id) if table in self._listeners else None
+        assignments = ', '.join(f"{field} = ?" for field in update_fields)
+        self.sql.execute_insert(f"UPDATE {table} SET {assignments} WHERE id = ?",
+                                list(update_fields.values()) + [record_id])
+        updated = self.sql.cursor.rowcount > 0
+        if updated:
+            self._changed(table)
+            if old is not None:
+                self._notify(table, old, self.get_by_id(table, record_id))
+        return updated
+
+    def execute_delete(self, table, record_id):
+        old = self.get_by_id(table, record_id) if table in self._listeners else None
+        self.sql.execute_insert(f"DELETE FROM {table} WHERE id = ?", (record_id,))
+        deleted = self.sql.cursor.rowcount > 0
+        if deleted:
+            self._changed(table)
+            if old is not None:
+                self._notify(table, old, None)
+        return deleted
+
+    def close(self):
+        self.sql.close()
@@ -1,81 +1,50 @@
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+# Prepared statements kept per connection; repeated query strings skip
+# re-parsing and planning
+STATEMENT_CACHE_SIZE = 256
+
 class Database:
     def __init__(self, db_path='data/vending.db'):
         # Ensure the data directory exists
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         
         # Connect to database
-        self.conn = sqlite3.connect(db_path)
+        self.conn = sqlite3.connect(db_path, cached_statements=STATEMENT_CACHE_SIZE)
         self.cursor = self.conn.cursor()
+        self.batch_depth = 0
         self.initialize_database()
     
     def initialize_database(self):
-        """Create database tables if they don't exist"""
-        # Create buildings table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS buildings (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            location TEXT
-        )
-        ''')
-        
-        # Create vending machines table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS vending_machines (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            building_id INTEGER,
-            location_description TEXT,
-            last_maintenance_date TEXT,
-            FOREIGN KEY (building_id) REFERENCES buildings (id)
-        )
-        ''')
-        
-        # Create products table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            price REAL NOT NULL,
-            category TEXT
-        )
-        ''')
-        
-        # Create inventory table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS inventory (
-            id INTEGER PRIMARY KEY,
-            machine_id INTEGER,
-            product_id INTEGER,
-            quantity INTEGER NOT NULL,
-            last_restock_date TEXT,
-            FOREIGN KEY (machine_id) REFERENCES vending_machines (id),
-            FOREIGN KEY (product_id) REFERENCES products (id)
-        )
-        ''')
-        
-        # Create maintenance records table
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS maintenance_records (
-            id INTEGER PRIMARY KEY,
-            machine_id INTEGER,
-            maintenance_date TEXT NOT NULL,
-            description TEXT,
-            performed_by TEXT,
-            FOREIGN KEY (machine_id) REFERENCES vending_machines (id)
-        )
-        ''')
+        """Create or upgrade the schema, then add sample data if empty"""
+        # Fast path: a file already at the current version has been set up
+        # before, so opening it costs one PRAGMA read
+        if self.cursor.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            return
         
-        # Commit changes
-        self.conn.commit()
+        self.migrate()
         
         # Add some sample data if tables are empty
         self.add_sample_data()
     
+    def migrate(self):
+        """Apply every migration newer than the file's PRAGMA user_version"""
+        version = self.cursor.execute("PRAGMA user_version").fetchone()[0]
+        for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            # Each step and its version bump commit together
+            self.cursor.execute("BEGIN")
+            try:
+                migration(self.cursor)
+                self.cursor.execute(f"PRAGMA user_version = {target}")
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+    
     def add_sample_data(self):
         """Add sample data if tables are empty"""
         if self.cursor.execute("SELECT COUNT(*) FROM buildings").fetchone()[0] == 0:
@@ -137,13 +106,286 @@ class Database:
         self.cursor.execute(query, params)
         return self.cursor.fetchall()
     
+    def iter_query(self, query, params=(), batch_size=1000):
+        """Execute SQL query and yield result rows a batch at a time"""
+        # A cursor of its own, so other statements can run while iterating
+        cursor = self.conn.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+    
     def execute_insert(self, query, params=()):
         """Execute SQL insert query and commit changes"""
-        self.cursor.execute(query, params)
-        self.conn.commit()
+        with self._statement():
+            self.cursor.execute(query, params)
         return self.cursor.lastrowid
     
+    def execute_many(self, query, param_rows):
+        """Execute one statement for every parameter tuple with a single commit"""
+        with self._statement():
+            self.cursor.executemany(query, param_rows)
+        return self.cursor.rowcount
+    
+    @contextmanager
+    def _statement(self):
+        """Commit a write made outside batch(), or roll back what it did if it fails"""
+        try:
+            yield
+        except BaseException:
+            # Otherwise the next write would commit the partial work too
+            if not self.batch_depth:
+                self.conn.rollback()
+            raise
+        if not self.batch_depth:
+            self.conn.commit()
+    
+    @contextmanager
+    def batch(self):
+        """Commit everything executed inside the block once, or roll it all back"""
+        self.batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.conn.rollback()
+            raise
+        else:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.conn.commit()
+    
     def close(self):
         """Close database connection"""
         self.conn.close()
-        
\ No newline at end of file
+
+
+def create_tables(cursor):
+    """Migration 1: the original tables"""
+    # Create buildings table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS buildings (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        location TEXT
+    )
+    ''')
+    
+    # Create vending machines table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS vending_machines (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        building_id INTEGER,
+        location_description TEXT,
+        last_maintenance_date TEXT,
+        FOREIGN KEY (building_id) REFERENCES buildings (id)
+    )
+    ''')
+    
+    # Create products table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        price REAL NOT NULL,
+        category TEXT
+    )
+    ''')
+    
+    # Create inventory table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS inventory (
+        id INTEGER PRIMARY KEY,
+        machine_id INTEGER,
+        product_id INTEGER,
+        quantity INTEGER NOT NULL,
+        last_restock_date TEXT,
+        FOREIGN KEY (machine_id) REFERENCES vending_machines (id),
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+    
+    # Create maintenance records table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS maintenance_records (
+        id INTEGER PRIMARY KEY,
+        machine_id INTEGER,
+        maintenance_date TEXT NOT NULL,
+        description TEXT,
+        performed_by TEXT,
+        FOREIGN KEY (machine_id) REFERENCES vending_machines (id)
+    )
+    ''')
+
+
+def add_indexes(cursor):
+    """Migration 2: indexes for the manager joins and one row per machine/product"""
+    # Where a product was added to a machine twice, fold the rows into the
+    # newest one: quantities add up and the latest restock date is kept
+    cursor.execute('''
+    UPDATE inventory
+    SET quantity = (SELECT SUM(d.quantity) FROM inventory d
+                    WHERE d.machine_id = inventory.machine_id AND d.product_id = inventory.product_id),
+        last_restock_date = (SELECT MAX(d.last_restock_date) FROM inventory d
+                             WHERE d.machine_id = inventory.machine_id AND d.product_id = inventory.product_id)
+    WHERE id IN (SELECT MAX(id) FROM inventory GROUP BY machine_id, product_id HAVING COUNT(*) > 1)
+    ''')
+    cursor.execute('''
+    DELETE FROM inventory
+    WHERE id NOT IN (SELECT MAX(id) FROM inventory GROUP BY machine_id, product_id)
+    ''')
+    if cursor.rowcount > 0:
+        print(f"Merged {cursor.rowcount} duplicate inventory rows into the newest row of each machine and product")
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_inventory_machine_product
+    ON inventory (machine_id, product_id)
+    ''')
+    # Covers get_machine_inventory without touching the table rows
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_inventory_machine_cover
+    ON inventory (machine_id, product_id, quantity, last_restock_date)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_inventory_quantity
+    ON inventory (quantity, machine_id, product_id)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_inventory_product
+    ON inventory (product_id)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_maintenance_machine_date
+    ON maintenance_records (machine_id, maintenance_date)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_maintenance_date
+    ON maintenance_records (maintenance_date)
+    ''')
+    # Julian-day expression indexes; queries using the same expression
+    # get range scans and ordering on dates without per-row parsing
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_machines_last_maintenance_jd
+    ON vending_machines (JULIANDAY(last_maintenance_date))
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_maintenance_date_jd
+    ON maintenance_records (JULIANDAY(maintenance_date))
+    ''')
+
+
+def create_sales_tables(cursor):
+    """Migration 3: the sales event log and its pre-aggregated rollups"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sales (
+        id INTEGER PRIMARY KEY,
+        machine_id INTEGER,
+        product_id INTEGER,
+        building_id INTEGER,
+        quantity INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        sold_at TEXT NOT NULL,
+        FOREIGN KEY (machine_id) REFERENCES vending_machines (id),
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+    # One row per granularity ('hour', 'day', 'month'), period and
+    # machine/product; building_id is copied from the machine at sale time
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sales_rollups (
+        id INTEGER PRIMARY KEY,
+        granularity TEXT NOT NULL,
+        period TEXT NOT NULL,
+        machine_id INTEGER,
+        product_id INTEGER,
+        building_id INTEGER,
+        units INTEGER NOT NULL,
+        revenue REAL NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_sales_rollups_key
+    ON sales_rollups (granularity, period, machine_id, product_id)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_sales_sold_at
+    ON sales (sold_at)
+    ''')
+
+
+# Schema history, oldest first. Existing files are upgraded in place on
+# open; append new steps here and never edit released ones.
+MIGRATIONS = [
+    create_tables,
+    add_indexes,
+    create_sales_tables
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+class PooledDatabase(Database):
+    """Database that gives every thread its own WAL-mode connection
+
+    In WAL mode readers do not block the writer or each other, so reports
+    can run in worker threads while the CLI keeps writing.
+    """
+
+    def __init__(self, db_path='data/vending.db', synchronous='NORMAL', busy_timeout=5000):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        # NORMAL is safe in WAL mode: a power loss can only drop the most
+        # recent commits, never corrupt the database
+        self.synchronous = synchronous
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.initialize_database()
+
+    def _connect(self):
+        """Open and configure a connection for the calling thread"""
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout / 1000, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @property
+    def batch_depth(self):
+        # Batches are per connection, so per thread
+        return getattr(self._local, 'batch_depth', 0)
+
+    @batch_depth.setter
+    def batch_depth(self, value):
+        self._local.batch_depth = value
+
+    @property
+    def cursor(self):
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._local.cursor = self.conn.cursor()
+        return cursor
+
+    def close(self):
+        """Close every thread's connection"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
@@ -1,6 +1,17 @@
 from database import Database
 from datetime import datetime
 
+UPDATE_INVENTORY_QUERY = """
+UPDATE inventory
+SET quantity = ?, last_restock_date = ?
+WHERE machine_id = ? AND product_id = ?
+"""
+
+INSERT_INVENTORY_QUERY = """
+INSERT INTO inventory (machine_id, product_id, quantity, last_restock_date)
+VALUES (?, ?, ?, ?)
+"""
+
 class InventoryManager:
     def __init__(self, db=None):
         """Initialize the inventory manager"""
@@ -28,14 +39,20 @@ class InventoryManager:
     def update_inventory(self, machine_id, product_id, new_quantity):
         """Update product quantity in machine"""
         current_date = datetime.now().strftime('%Y-%m-%d')
-        query = """
-        UPDATE inventory
-        SET quantity = ?, last_restock_date = ?
-        WHERE machine_id = ? AND product_id = ?
-        """
-        self.db.execute_insert(query, (new_quantity, current_date, machine_id, product_id))
+        self.db.execute_insert(UPDATE_INVENTORY_QUERY, (new_quantity, current_date, machine_id, product_id))
         print(f"Updated product {product_id} in machine {machine_id} to quantity {new_quantity}")
     
+    def update_inventory_bulk(self, updates):
+        """Update many (machine_id, product_id, new_quantity) rows in one commit, or none"""
+        current_date = datetime.now().strftime('%Y-%m-%d')
+        with self.db.batch():
+            count = self.db.execute_many(UPDATE_INVENTORY_QUERY, (
+                (new_quantity, current_date, machine_id, product_id)
+                for machine_id, product_id, new_quantity in updates
+            ))
+        print(f"Updated {count} inventory rows")
+        return count
+    
     def get_low_stock_items(self, threshold=5):
         """Get items that are below threshold quantity"""
         query = """
@@ -62,11 +79,18 @@ class InventoryManager:
     def add_product_to_machine(self, machine_id, product_id, quantity):
         """Add a product to a machine's inventory"""
         current_date = datetime.now().strftime('%Y-%m-%d')
-        query = """
-        INSERT INTO inventory (machine_id, product_id, quantity, last_restock_date)
-        VALUES (?, ?, ?, ?)
-        """
-        inventory_id = self.db.execute_insert(query, (machine_id, product_id, quantity, current_date))
+        inventory_id = self.db.execute_insert(INSERT_INVENTORY_QUERY, (machine_id, product_id, quantity, current_date))
         print(f"Added product {product_id} to machine {machine_id} with quantity {quantity}")
         return inventory_id
+    
+    def add_products_to_machines(self, items):
+        """Add many (machine_id, product_id, quantity) rows in one commit, or none"""
+        current_date = datetime.now().strftime('%Y-%m-%d')
+        with self.db.batch():
+            count = self.db.execute_many(INSERT_INVENTORY_QUERY, (
+                (machine_id, product_id, quantity, current_date)
+                for machine_id, product_id, quantity in items
+            ))
+        print(f"Added {count} inventory rows")
+        return count
     
\ No newline at end of file
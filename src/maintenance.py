@@ -1,6 +1,17 @@
 from database import Database
 from datetime import datetime
 
+INSERT_MAINTENANCE_QUERY = """
+INSERT INTO maintenance_records (machine_id, maintenance_date, description, performed_by)
+VALUES (?, ?, ?, ?)
+"""
+
+UPDATE_LAST_MAINTENANCE_QUERY = """
+UPDATE vending_machines
+SET last_maintenance_date = ?
+WHERE id = ?
+"""
+
 class MaintenanceManager:
     def __init__(self, db=None):
         """Initialize the maintenance manager"""
@@ -24,32 +35,41 @@ class MaintenanceManager:
     def add_maintenance_record(self, machine_id, description, performed_by):
         """Add a new maintenance record"""
         current_date = datetime.now().strftime('%Y-%m-%d')
-        query = """
-        INSERT INTO maintenance_records (machine_id, maintenance_date, description, performed_by)
-        VALUES (?, ?, ?, ?)
-        """
-        record_id = self.db.execute_insert(query, (machine_id, current_date, description, performed_by))
-        
-        # Update the last maintenance date in the vending machine record
-        update_query = """
-        UPDATE vending_machines
-        SET last_maintenance_date = ?
-        WHERE id = ?
-        """
-        self.db.execute_insert(update_query, (current_date, machine_id))
+        with self.db.batch():
+            record_id = self.db.execute_insert(INSERT_MAINTENANCE_QUERY, (machine_id, current_date, description, performed_by))
+            
+            # Update the last maintenance date in the vending machine record
+            self.db.execute_insert(UPDATE_LAST_MAINTENANCE_QUERY, (current_date, machine_id))
         
         print(f"Added maintenance record for machine {machine_id}")
         return record_id
     
+    def add_maintenance_records(self, records):
+        """Add many (machine_id, description, performed_by) records in one commit"""
+        current_date = datetime.now().strftime('%Y-%m-%d')
+        records = list(records)
+        with self.db.batch():
+            self.db.execute_many(INSERT_MAINTENANCE_QUERY, (
+                (machine_id, current_date, description, performed_by)
+                for machine_id, description, performed_by in records
+            ))
+            self.db.execute_many(UPDATE_LAST_MAINTENANCE_QUERY, (
+                (current_date, machine_id) for machine_id in {r[0] for r in records}
+            ))
+        print(f"Added {len(records)} maintenance records")
+        return len(records)
+    
     def get_machines_due_maintenance(self, days=30):
         """Get machines that haven't had maintenance in specified days"""
+        # Filtering and ordering on JULIANDAY(last_maintenance_date) itself
+        # lets SQLite use idx_machines_last_maintenance_jd
         query = """
         SELECT vm.id, vm.name, b.name as building, vm.location_description, vm.last_maintenance_date,
         JULIANDAY('now') - JULIANDAY(vm.last_maintenance_date) as days_since_maintenance
         FROM vending_machines vm
         JOIN buildings b ON vm.building_id = b.id
-        WHERE JULIANDAY('now') - JULIANDAY(vm.last_maintenance_date) >= ?
-        ORDER BY days_since_maintenance DESC
+        WHERE JULIANDAY(vm.last_maintenance_date) <= JULIANDAY('now') - ?
+        ORDER BY JULIANDAY(vm.last_maintenance_date) ASC
         """
         return self.db.execute_query(query, (days,))
     
@@ -1,8 +1,8 @@
 # Ensure required packages are installed by running the following command in your terminal:
 # pip install pandas matplotlib
+# Both are imported inside the methods that use them, so starting the
+# application does not pay for them.
 from database import Database
-import pandas as pd
-import matplotlib.pyplot as plt
 import os
 
 class ReportGenerator:
@@ -14,6 +14,7 @@ class ReportGenerator:
     
     def generate_inventory_report(self, export_csv=False):
         """Generate inventory report for all machines"""
+        import pandas as pd
         query = """
         SELECT vm.name as machine, b.name as building, p.name as product, 
                p.category, i.quantity, i.last_restock_date
@@ -39,6 +40,7 @@ class ReportGenerator:
     
     def generate_maintenance_report(self, export_csv=False):
         """Generate maintenance report"""
+        import pandas as pd
         query = """
         SELECT vm.name as machine, b.name as building, m.maintenance_date,
                m.description, m.performed_by
@@ -63,6 +65,7 @@ class ReportGenerator:
     
     def generate_low_stock_report(self, threshold=5, export_csv=False):
         """Generate report of low stock items"""
+        import pandas as pd
         query = """
         SELECT vm.name as machine, b.name as building, p.name as product, 
                p.category, i.quantity, i.last_restock_date
@@ -89,6 +92,8 @@ class ReportGenerator:
     
     def visualize_inventory_by_machine(self):
         """Create a bar chart of product counts by machine"""
+        import pandas as pd
+        import matplotlib.pyplot as plt
         query = """
         SELECT vm.name as machine, SUM(i.quantity) as total_items
         FROM inventory i
@@ -119,6 +124,8 @@ class ReportGenerator:
     
     def visualize_product_distribution(self):
         """Create a pie chart of product category distribution"""
+        import pandas as pd
+        import matplotlib.pyplot as plt
         query = """
         SELECT p.category, SUM(i.quantity) as total_quantity
         FROM inventory i
@@ -0,0 +1,457 @@
+import operator
+from contextlib import contextmanager
+
+# Foreign keys that get a secondary value -> records index
+INDEXED_FIELDS = {
+    "inventory": ("machine_id", "product_id"),
+    "maintenance_records": ("machine_id",)
+}
+
+# Suffixes accepted in execute_query keyword filters, e.g. quantity__le=5
+FILTER_OPERATORS = {
+    'eq': operator.eq,
+    'ne': operator.ne,
+    'lt': operator.lt,
+    'le': operator.le,
+    'gt': operator.gt,
+    'ge': operator.ge,
+    'in': lambda value, options: value in options
+}
+
+# Tables every backend starts out with
+TABLES = ("buildings", "vending_machines", "products", "inventory", "maintenance_records",
+          "sales", "sales_rollups")
+
+
+class ConflictError(Exception):
+    """Another writer committed since the expected version was read"""
+
+
+def parse_criteria(criteria):
+    """Turn execute_query keyword filters into (field, op, value) triples"""
+    predicates = []
+    for key, value in criteria.items():
+        field, _, op = key.partition('__')
+        if (op or 'eq') not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator: {key}")
+        if op == 'in':
+            # Read once, as backends go over the options more than once
+            value = tuple(value)
+        predicates.append((field, op or 'eq', value))
+    return predicates
+
+
+class StorageBackend:
+    """Table API shared by every backend the managers can run on
+
+    Records are dicts with an integer 'id'. Backends implement the
+    NotImplementedError methods; the rest have generic versions built on
+    them that a backend may override with something faster.
+
+    Every write bumps a per-table change counter. Lookups of the small
+    dimension tables are cached against those counters, so managers and
+    reports can ask for them on every call and only pay to rebuild after
+    the tables they depend on change.
+
+    Callbacks registered with subscribe() hear about every single-record
+    write made through the backend, including rollbacks, right after its
+    counter bump. Anything else that changes a table, such as a reload,
+    only bumps the counter, so listeners compare counters to tell whether
+    they missed something.
+    """
+
+    def __init__(self):
+        self._generations = {}
+        self._derived = {}
+        self._listeners = {}
+        self._indexes = {}
+
+    def _touch(self, table):
+        self._generations[table] = self._generations.get(table, 0) + 1
+
+    def _touch_all(self):
+        for table in set(self._generations) | set(TABLES):
+            self._touch(table)
+
+    def _check_external_changes(self):
+        """Invalidate caches if someone else changed the data; see subclasses"""
+
+    def generation(self, table, external=True):
+        """Return the change counter of `table`, which goes up with every write to it
+
+        Anything computed from a table can be kept until its counter moves.
+        external=False skips looking for commits made outside this object,
+        for callers only matching up a write they were just notified of.
+        """
+        if external:
+            self._check_external_changes()
+        return self._generations.get(table, 0)
+
+    def subscribe(self, table, callback):
+        """Call callback(old, new) after each write to `table`
+
+        old is a copy of the record before the write and new the record
+        after it; old is None for inserts and new is None for deletes.
+        """
+        self._listeners.setdefault(table, []).append(callback)
+
+    def unsubscribe(self, table, callback):
+        self._listeners.get(table, []).remove(callback)
+
+    def _notify(self, table, old, new):
+        for callback in self._listeners.get(table, ()):
+            callback(old, new)
+
+    def index(self, name, factory):
+        """Return the index shared under `name`, built by factory(self) on first use"""
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._indexes[name] = factory(self)
+        return index
+
+    def derived(self, key, tables, build, params=(), check=None):
+        """Return build(), cached until one of `tables` is written
+
+        It is also rebuilt when called with other `params` than it was built
+        with, or when check(value) rejects the cached value, for example
+        a file that has since been deleted.
+        """
+        self._check_external_changes()
+        cached = self._derived.get(key)
+        if (cached is not None and cached[0] == self._stamp(tables, params)
+                and (check is None or check(cached[1]))):
+            return cached[1]
+        value = build()
+        # Stamped after building, since lazy table loads count as writes
+        self._derived[key] = (self._stamp(tables, params), value)
+        return value
+
+    def _stamp(self, tables, params=()):
+        return params, tuple(self._generations.get(table, 0) for table in tables)
+
+    def lookup(self, table):
+        """Return a cached id -> record dict of `table`; treat it as read-only"""
+        return self.derived(('lookup', table), (table,),
+                            lambda: {record['id']: record for record in self.execute_query(table)})
+
+    def machine_buildings(self):
+        """Return a cached machine id -> building name dict"""
+        def build():
+            buildings = self.lookup("buildings")
+            return {machine_id: buildings.get(machine.get('building_id'), {}).get('name', '')
+                    for machine_id, machine in self.lookup("vending_machines").items()}
+        return self.derived('machine_buildings', ("vending_machines", "buildings"), build)
+
+    def execute_query(self, table, filter_fn=None, **criteria):
+        """Return records matching an optional filter function and field criteria
+
+        Criteria are `field=value` for equality or `field__op=value` with op
+        one of eq, ne, lt, le, gt, ge or in.
+        """
+        raise NotImplementedError
+
+    def iter_query(self, table, **criteria):
+        """Yield the records execute_query() would return, without building the list where possible"""
+        yield from self.execute_query(table, **criteria)
+
+    def get_by_id(self, table, record_id):
+        """Return the record with the given id, or None"""
+        raise NotImplementedError
+
+    def execute_insert(self, table, record):
+        """Insert a record, set its 'id' and return it"""
+        raise NotImplementedError
+
+    def execute_update(self, table, record_id, update_fields):
+        """Update fields of one record; False if it does not exist"""
+        raise NotImplementedError
+
+    def execute_delete(self, table, record_id):
+        """Delete one record; False if it does not exist"""
+        raise NotImplementedError
+
+    def transaction(self, expected_version=None):
+        """Context manager committing the writes inside it together or not at all"""
+        raise NotImplementedError
+
+    def snapshot(self, tables):
+        """Return {table: records} for `tables`, all read at one point in time
+
+        The records are copies, so later writes do not show through.
+        """
+        with self.transaction():
+            # Copied while writers are held off; execute_query may hand out live records
+            return {table: [dict(record) for record in self.execute_query(table)] for table in tables}
+
+    def execute_many(self, table, records):
+        """Insert several records as one batch and return their ids"""
+        with self.transaction():
+            return [self.execute_insert(table, record) for record in records]
+
+    def execute_join(self, table, join_table, foreign_key, **criteria):
+        """Return (record, joined_record) pairs for records matching criteria
+
+        joined_record is the `join_table` row whose id is record[foreign_key],
+        or None when there is none.
+        """
+        return [(record, self.get_by_id(join_table, record.get(foreign_key)))
+                for record in self.execute_query(table, **criteria)]
+
+    def column(self, table, field):
+        """Return one field of every record in `table`, in table order"""
+        return [record.get(field) for record in self.execute_query(table)]
+
+    def to_frame(self, table, fields):
+        """Return `fields` of every record in `table` as a pandas DataFrame
+
+        Built one column at a time from column(), in table order.
+        """
+        import pandas as pd
+        return pd.DataFrame({field: self.column(table, field) for field in fields}, columns=list(fields))
+
+    def close(self):
+        pass
+
+
+class MemoryDatabase(StorageBackend):
+    """Backend that keeps every table in memory and never touches disk
+
+    Each table is an insertion-ordered id -> record dict, so point reads,
+    updates and deletes by id are constant time, and the foreign keys in
+    INDEXED_FIELDS have value -> records indexes. Persistent backends build
+    on this and hook in through _rows(), _before_read(), _write_guard() and
+    _commit().
+    """
+
+    def __init__(self, data=None):
+        super().__init__()
+        self.tables = {}
+        self.next_ids = {}
+        self.field_indexes = {}
+        # Bumped on every commit; see transaction(expected_version=...)
+        self.version = 0
+        # Pending writes and undo steps of the open transaction
+        self._pending = None
+        self._undo = None
+        self._set_data(data if data is not None else {table: [] for table in TABLES})
+
+    def execute_query(self, table, filter_fn=None, **criteria):
+        """Return records matching an optional filter function and field criteria
+
+        Criteria are `field=value` for equality or `field__op=value` with op
+        one of eq, ne, lt, le, gt, ge or in. Equality and `in` on an indexed
+        foreign key are answered from the index instead of a table scan.
+        """
+        self._before_read()
+        predicates = parse_criteria(criteria)
+        records = self._candidates(table, predicates)
+        for field, op, value in predicates:
+            compare = FILTER_OPERATORS[op]
+            if op in ('eq', 'ne'):
+                records = [r for r in records if field in r and compare(r[field], value)]
+            else:
+                # As in SQL, a None never satisfies an ordering or `in`
+                records = [r for r in records if r.get(field) is not None and compare(r[field], value)]
+        if filter_fn:
+            records = list(filter(filter_fn, records))
+        return records
+
+    def _candidates(self, table, predicates):
+        rows = self._rows(table)
+        best = None
+        best_size = None
+        # Size up the index buckets first and only copy out the smallest
+        for field, op, value in predicates:
+            index = self.field_indexes.get((table, field))
+            if index is None or op not in ('eq', 'in'):
+                continue
+            buckets = [index.get(value, {})] if op == 'eq' else [index.get(v, {}) for v in value]
+            size = sum(len(bucket) for bucket in buckets)
+            if best is None or size < best_size:
+                best, best_size = buckets, size
+        if best is None:
+            return list(rows.values())
+        return [r for bucket in best for r in bucket.values()]
+
+    def get_by_id(self, table, record_id):
+        """Return the record with the given id, or None"""
+        self._before_read()
+        return self._rows(table).get(record_id)
+
+    def column(self, table, field):
+        """Return one field of every record in `table`, in table order"""
+        self._before_read()
+        rows = self._rows(table).values()
+        try:
+            return list(map(operator.itemgetter(field), rows))
+        except KeyError:
+            return [record.get(field) for record in rows]
+
+    @contextmanager
+    def transaction(self, expected_version=None):
+        """Group writes so they commit together or not at all
+
+        Changes are visible straight away but are only committed once the
+        block exits cleanly. If the block raises, every change made inside
+        it is undone. Nested transactions join the outermost one.
+
+        Pass the `version` seen when the data was read as expected_version
+        to raise ConflictError if anyone has committed since.
+        """
+        with self._write_guard():
+            if expected_version is not None and expected_version != self.version:
+                raise ConflictError(f"Expected version {expected_version}, found {self.version}")
+            if self._pending is not None:
+                yield self
+                return
+            self._pending = []
+            self._undo = []
+            next_ids = dict(self.next_ids)
+            try:
+                yield self
+                if self._pending:
+                    self._commit(self._pending)
+            except BaseException:
+                for step in reversed(self._undo):
+                    self._revert(step)
+                self.next_ids = next_ids
+                raise
+            finally:
+                self._pending = None
+                self._undo = None
+
+    def execute_insert(self, table, record):
+        with self._write_guard():
+            self._rows(table)
+            record['id'] = self._generate_new_id(table)
+            self._add_record(table, record)
+            self._notify(table, None, record)
+            self._record_undo(('insert', table, record['id']))
+            self._persist({"op": "insert", "table": table, "record": record})
+            return record['id']
+
+    def execute_update(self, table, record_id, update_fields):
+        with self._write_guard():
+            record = self._rows(table).get(record_id)
+            if record is None:
+                return False
+            if self._undo is not None:
+                previous = {k: record[k] for k in update_fields if k in record}
+                added = [k for k in update_fields if k not in record]
+                self._undo.append(('update', table, record_id, previous, added))
+            old = dict(record) if table in self._listeners else None
+            self._update_record(table, record, update_fields)
+            self._notify(table, old, record)
+            self._persist({"op": "update", "table": table, "id": record_id, "fields": update_fields})
+            return True
+
+    def execute_delete(self, table, record_id):
+        with self._write_guard():
+            record = self._rows(table).get(record_id)
+            if not self._remove_record(table, record_id):
+                return False
+            self._notify(table, record, None)
+            self._record_undo(('delete', table, record))
+            self._persist({"op": "delete", "table": table, "id": record_id})
+            return True
+
+    def _rows(self, table):
+        return self.tables.get(table, {})
+
+    def _before_read(self):
+        pass
+
+    def _check_external_changes(self):
+        self._before_read()
+
+    @contextmanager
+    def _write_guard(self):
+        yield
+
+    def _commit(self, entries):
+        self.version += 1
+
+    def _persist(self, entry):
+        if self._pending is not None:
+            self._pending.append(entry)
+        else:
+            self._commit([entry])
+
+    def _record_undo(self, step):
+        if self._undo is not None:
+            self._undo.append(step)
+
+    def _revert(self, step):
+        if step[0] == 'insert':
+            record = self._rows(step[1]).get(step[2])
+            self._remove_record(step[1], step[2])
+            self._notify(step[1], record, None)
+        elif step[0] == 'update':
+            _, table, record_id, previous, added = step
+            record = self._rows(table).get(record_id)
+            old = dict(record) if table in self._listeners else None
+            self._update_record(table, record, previous)
+            for key in added:
+                # Unindexed by construction: indexed fields exist on every row
+                del record[key]
+            self._notify(table, old, record)
+        elif step[0] == 'delete':
+            self._add_record(step[1], step[2])
+            self._notify(step[1], None, step[2])
+
+    def _add_record(self, table, record):
+        self._touch(table)
+        self.tables.setdefault(table, {})[record['id']] = record
+        if record['id'] >= self.next_ids.get(table, 1):
+            self.next_ids[table] = record['id'] + 1
+        for field in INDEXED_FIELDS.get(table, ()):
+            self._index_add(table, field, record)
+
+    def _update_record(self, table, record, update_fields):
+        self._touch(table)
+        moved = [f for f in INDEXED_FIELDS.get(table, ()) if f in update_fields]
+        for field in moved:
+            self._index_remove(table, field, record)
+        record.update(update_fields)
+        for field in moved:
+            self._index_add(table, field, record)
+
+    def _remove_record(self, table, record_id):
+        record = self._rows(table).pop(record_id, None)
+        if record is None:
+            return False
+        self._touch(table)
+        for field in INDEXED_FIELDS.get(table, ()):
+            self._index_remove(table, field, record)
+        return True
+
+    def _index_add(self, table, field, record):
+        index = self.field_indexes.setdefault((table, field), {})
+        index.setdefault(record.get(field), {})[record['id']] = record
+
+    def _index_remove(self, table, field, record):
+        bucket = self.field_indexes.get((table, field), {}).get(record.get(field))
+        if bucket is not None:
+            bucket.pop(record['id'], None)
+            if not bucket:
+                del self.field_indexes[(table, field)][record.get(field)]
+
+    def _set_data(self, data):
+        self._touch_all()
+        self.tables = {}
+        self.next_ids = {}
+        self.field_indexes = {}
+        for table, rows in data.items():
+            self._add_rows(table, rows)
+
+    def _add_rows(self, table, rows):
+        for record in rows:
+            self._add_record(table, record)
+        self.tables.setdefault(table, {})
+        self.next_ids.setdefault(table, 1)
+
+    def _generate_new_id(self, table):
+        # Ids are never reused while the store is open, even after deletes
+        new_id = self.next_ids.get(table, 1)
+        self.next_ids[table] = new_id + 1
+        return new_id
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import time
+
+from .inventory import whole_number
+
+# Event type -> sign applied to the event's quantity
+EVENT_TYPES = {
+    'vend': -1,
+    'restock': 1
+}
+
+
+class TelemetryServer:
+    """Asyncio TCP listener applying vend and restock events to inventory
+
+    Machines send newline-delimited JSON events such as
+    {"type": "vend", "machine_id": 1, "product_id": 2, "quantity": 1}.
+    Events are coalesced into one quantity change per (machine, product)
+    and applied every `flush_interval` seconds in a single transaction.
+    Once `max_pending` events are waiting to be applied, a flush starts
+    straight away and connections stop being read until it is done, so TCP
+    flow control slows the senders down.
+
+    A connection whose first line is an HTTP GET gets the counters from
+    stats() back as JSON.
+
+    Flushes run in a worker thread so the event loop keeps serving. A
+    database tied to the thread that opened it, such as a SqliteDatabase
+    over a plain src.database.Database, needs in_thread=False (or a
+    PooledDatabase underneath).
+    """
+
+    def __init__(self, db, host='127.0.0.1', port=8765, flush_interval=1.0, max_pending=10000, in_thread=True):
+        self.db = db
+        self.host = host
+        self.port = port
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.in_thread = in_thread
+        self.counters = {
+            "connections": 0,
+            "open_connections": 0,
+            "received": 0,
+            "rejected": 0,
+            "applied": 0,
+            "unknown_items": 0,
+            "commits": 0,
+            "failed_commits": 0,
+            "backpressure_waits": 0
+        }
+        self._changes = {}
+        self._pending = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._server = None
+        self._flusher = None
+        self._started = None
+
+    async def start(self):
+        """Start listening and flushing; returns once the socket is bound"""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started = time.monotonic()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """Stop accepting connections and apply whatever is still pending"""
+        self._server.close()
+        await self._server.wait_closed()
+        self._closing = True
+        self._wake.set()
+        await self._flusher
+        await self._flush()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def stats(self):
+        """Return the counters plus queue depth and events applied per second"""
+        elapsed = time.monotonic() - self._started if self._started else 0
+        stats = dict(self.counters)
+        stats["pending"] = self._pending
+        stats["events_per_second"] = round(self.counters["applied"] / elapsed, 1) if elapsed else 0.0
+        return stats
+
+    async def _handle(self, reader, writer):
+        self.counters["connections"] += 1
+        self.counters["open_connections"] += 1
+        try:
+            first = True
+            async for line in reader:
+                if first and line.startswith(b'GET '):
+                    await self._send_stats(reader, writer)
+                    return
+                first = False
+                if not line.strip():
+                    continue
+                if not self._drained.is_set():
+                    self.counters["backpressure_waits"] += 1
+                    await self._drained.wait()
+                self._accept(line)
+        except ConnectionError:
+            pass
+        finally:
+            self.counters["open_connections"] -= 1
+            writer.close()
+
+    async def _send_stats(self, reader, writer):
+        # Skip the request headers, then answer and close
+        while (await reader.readline()).strip():
+            pass
+        body = json.dumps(self.stats()).encode('utf-8')
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                     + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('ascii') + body)
+        await writer.drain()
+
+    def _accept(self, line):
+        self.counters["received"] += 1
+        try:
+            event = json.loads(line)
+            sign = EVENT_TYPES[event["type"]]
+            key = (whole_number(event["machine_id"], "machine_id"), whole_number(event["product_id"], "product_id"))
+            quantity = whole_number(event.get("quantity", 1), "quantity")
+            if quantity < 0:
+                raise ValueError("negative quantity")
+        except (ValueError, KeyError, TypeError):
+            self.counters["rejected"] += 1
+            return
+        self._changes[key] = self._changes.get(key, 0) + sign * quantity
+        self._pending += 1
+        if self._pending >= self.max_pending:
+            self._drained.clear()
+            self._wake.set()
+
+    async def _flush_loop(self):
+        # The only place flushes run while serving, so they never overlap
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self._flush()
+
+    async def _flush(self):
+        if not self._changes:
+            return
+        changes, events = self._changes, self._pending
+        self._changes = {}
+        self._pending = 0
+        try:
+            if self.in_thread:
+                await asyncio.to_thread(self._apply, changes)
+            else:
+                self._apply(changes)
+        except Exception as e:
+            # The transaction rolled back; the events are dropped, not retried
+            self.counters["failed_commits"] += 1
+            self.counters["rejected"] += events
+            print(f"Telemetry flush failed: {e}")
+            return
+        finally:
+            self._drained.set()
+        self.counters["applied"] += events
+        self.counters["commits"] += 1
+
+    def _apply(self, changes):
+        machines = self.db.lookup("vending_machines")
+        products = self.db.lookup("products")
+        today = time.strftime('%Y-%m-%d')
+        with self.db.transaction():
+            for (machine_id, product_id), delta in changes.items():
+                items = self.db.execute_query("inventory", machine_id=machine_id, product_id=product_id)
+                if items:
+                    fields = {"quantity": max(items[0]['quantity'] + delta, 0)}
+                    if delta > 0:
+                        fields["last_restock_date"] = today
+                    self.db.execute_update("inventory", items[0]['id'], fields)
+                elif delta > 0 and machine_id in machines and product_id in products:
+                    self.db.execute_insert("inventory", {
+                        "machine_id": machine_id,
+                        "product_id": product_id,
+                        "quantity": delta,
+                        "last_restock_date": today
+                    })
+                else:
+                    self.counters["unknown_items"] += 1
+
+
+async def simulate_machine(host, port, machine_id, product_ids, events=100, restock_every=0, delay=0):
+    """Connect like a vending machine and send `events` vend events
+
+    Every `restock_every`-th event is a restock of 10 instead, when set.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i in range(events):
+            event_type = 'restock' if restock_every and (i + 1) % restock_every == 0 else 'vend'
+            event = {
+                "type": event_type,
+                "machine_id": machine_id,
+                "product_id": product_ids[i % len(product_ids)],
+                "quantity": 10 if event_type == 'restock' else 1
+            }
+            writer.write(json.dumps(event).encode('utf-8') + b"\n")
+            await writer.drain()
+            if delay:
+                await asyncio.sleep(delay)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_simulation(db, machines=10, events=1000, flush_interval=0.1, max_pending=10000, in_thread=True):
+    """Run a server on a free port against `machines` simulated clients
+
+    Every machine in the database with stock is driven by up to `machines`
+    concurrent clients. Returns the server's final stats().
+    """
+    server = TelemetryServer(db, port=0, flush_interval=flush_interval, max_pending=max_pending, in_thread=in_thread)
+    await server.start()
+    stocked = {}
+    for item in db.execute_query("inventory"):
+        stocked.setdefault(item['machine_id'], []).append(item['product_id'])
+    clients = [simulate_machine(server.host, server.port, machine_id, product_ids, events)
+               for machine_id, product_ids in list(stocked.items())[:machines]]
+    await asyncio.gather(*clients)
+    # Let the server read what is still buffered before stopping
+    while server.counters["open_connections"]:
+        await asyncio.sleep(0.01)
+    await server.stop()
+    return server.stats()
@@ -0,0 +1,45 @@
+"""Import the application as the `vending` package, whatever the checkout is called
+
+The modules use relative imports, so they only load as part of a
+package; main.py does the same when it is run as a script.
+"""
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.modules.setdefault('vending', importlib.import_module(os.path.basename(ROOT)))
+
+
+def seed(db):
+    """Fill `db` with three buildings, four machines, six products and their stock"""
+    for name in ('Science Building', 'Library', 'Student Union'):
+        db.execute_insert("buildings", {"name": name, "location": "Campus"})
+    for name, building_id in (('Snack Machine 1', 1), ('Drink Machine 1', 1), ('Snack Machine 2', 2), ('Drink Machine 2', 3)):
+        db.execute_insert("vending_machines", {"name": name, "building_id": building_id,
+                                               "location_description": "Lobby", "last_maintenance_date": "2024-01-05"})
+    for name, price, category in (('Potato Chips', 1.5, 'Snacks'), ('Chocolate Bar', 1.25, 'Snacks'), ('Cola', 1.75, 'Drinks'),
+                                  ('Water', 1.0, 'Drinks'), ('Energy Bar', 2.0, 'Snacks'), ('Fruit Juice', 2.25, 'Drinks')):
+        db.execute_insert("products", {"name": name, "price": price, "category": category})
+    for machine_id, product_id, quantity in ((1, 1, 100), (1, 2, 100), (2, 3, 100), (2, 4, 100), (3, 1, 100), (4, 6, 100)):
+        db.execute_insert("inventory", {"machine_id": machine_id, "product_id": product_id,
+                                        "quantity": quantity, "last_restock_date": "2024-03-15"})
+
+
+@pytest.fixture
+def db():
+    """A MemoryDatabase holding the seed() data"""
+    from vending.storage import MemoryDatabase
+    db = MemoryDatabase()
+    seed(db)
+    return db
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test inside an empty temporary directory"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
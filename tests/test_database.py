@@ -0,0 +1,48 @@
+import sqlite3
+
+from vending.src.database import SCHEMA_VERSION, Database, create_tables
+
+
+def make_version_0(path):
+    """A file with the original tables, user_version 0 and a product stocked twice in machine 1"""
+    conn = sqlite3.connect(path)
+    create_tables(conn.cursor())
+    conn.execute("INSERT INTO buildings VALUES (1, 'Library', 'Central Campus')")
+    conn.executemany("INSERT INTO inventory VALUES (?, ?, ?, ?, ?)", [
+        (1, 1, 1, 10, '2024-03-15'),
+        (2, 1, 2, 7, '2024-02-01'),
+        (3, 1, 1, 5, '2024-04-01'),
+        (4, 1, 1, 2, '2024-01-20'),
+    ])
+    conn.commit()
+    conn.close()
+
+
+def test_migration_merges_duplicate_inventory(tmp_path, capsys):
+    path = str(tmp_path / "data" / "vending.db")
+    (tmp_path / "data").mkdir()
+    make_version_0(path)
+
+    db = Database(path)
+
+    assert db.execute_query("PRAGMA user_version")[0][0] == SCHEMA_VERSION
+    # The newest row of the pair is kept with the summed quantity and latest date
+    assert db.execute_query("SELECT * FROM inventory ORDER BY id") == [
+        (2, 1, 2, 7, '2024-02-01'),
+        (4, 1, 1, 17, '2024-04-01'),
+    ]
+    assert "Merged 2 duplicate inventory rows" in capsys.readouterr().out
+    db.close()
+
+
+def test_current_file_skips_setup(tmp_path, monkeypatch):
+    path = str(tmp_path / "data" / "vending.db")
+    Database(path).close()
+
+    def fail(self):
+        raise AssertionError("setup ran on a file already at SCHEMA_VERSION")
+    monkeypatch.setattr(Database, "migrate", fail)
+    monkeypatch.setattr(Database, "add_sample_data", fail)
+    db = Database(path)
+    assert db.execute_query("SELECT COUNT(*) FROM inventory")[0][0] == 8
+    db.close()
@@ -0,0 +1,69 @@
+import pytest
+
+from vending.inventory import InventoryManager, whole_number
+
+
+def quantity(db, machine_id, product_id):
+    items = db.execute_query("inventory", machine_id=machine_id, product_id=product_id)
+    return items[0]['quantity'] if items else None
+
+
+def test_whole_number_rejects_fractions_and_booleans():
+    assert whole_number(3, "quantity") == 3
+    assert whole_number(3.0, "quantity") == 3
+    assert whole_number(" 4 ", "quantity") == 4
+    assert whole_number("5.0", "quantity") == 5
+    for value in (2.9, "2.5", True, "True", "", None):
+        with pytest.raises(ValueError, match="quantity must be a whole number"):
+            whole_number(value, "quantity")
+
+
+def test_import_csv_manifest(db, tmp_path):
+    path = tmp_path / "manifest.csv"
+    # Saved the way Excel does, with a byte order mark before the header
+    path.write_text("machine_id,product_id,quantity\n"
+                    "1,1,40\n"
+                    "1,1,45\n"
+                    "1,3,7.0\n"
+                    "9,1,5\n"
+                    "1,2,2.5\n"
+                    "1,2,-1\n"
+                    "1,2,\n"
+                    "2,3,True\n", encoding='utf-8-sig')
+
+    result = InventoryManager(db).import_restock_manifest(str(path))
+
+    assert (result['rows'], result['updated'], result['added'], result['error_count']) == (8, 1, 1, 5)
+    assert result['errors'] == [(5, "unknown machine 9"),
+                                (6, "quantity must be a whole number, got '2.5'"),
+                                (7, "quantity cannot be negative"),
+                                (8, "missing quantity"),
+                                (9, "quantity must be a whole number, got 'True'")]
+    # The last row for a pair wins
+    assert quantity(db, 1, 1) == 45
+    assert quantity(db, 1, 3) == 7
+    assert quantity(db, 1, 2) == 100
+
+
+def test_import_jsonl_manifest(db, tmp_path):
+    path = tmp_path / "manifest.jsonl"
+    path.write_text('{"machine_id": 4, "product_id": 6, "quantity": 12}\n'
+                    '{"machine_id": 4, "product_id": 5, "quantity": true}\n'
+                    '[4, 5, 1]\n'
+                    '{"machine_id": 4,\n'
+                    '\n'
+                    '{"machine_id": 4, "product_id": 5, "quantity": 3}\n')
+
+    result = InventoryManager(db).import_restock_manifest(str(path), max_errors=2)
+
+    assert (result['rows'], result['updated'], result['added'], result['error_count']) == (5, 1, 1, 3)
+    assert result['errors'] == [(2, "quantity must be a whole number, got True"), (3, "expected a JSON object")]
+    assert quantity(db, 4, 6) == 12
+    assert quantity(db, 4, 5) == 3
+
+
+def test_import_csv_manifest_needs_header(db, tmp_path):
+    path = tmp_path / "manifest.csv"
+    path.write_text("machine,product_id,quantity\n1,1,5\n")
+    with pytest.raises(ValueError, match="missing machine_id"):
+        InventoryManager(db).import_restock_manifest(str(path))
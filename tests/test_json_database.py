@@ -0,0 +1,129 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from vending.json_database import JsonDatabase
+from vending.storage import ConflictError
+
+
+def test_journal_writes_are_replayed_on_open(workdir):
+    db = JsonDatabase('data/store.json', journal=True)
+    snapshot = os.path.getmtime('data/store.json'), os.path.getsize('data/store.json')
+    building_id = db.execute_insert("buildings", {"name": "Library", "location": "Central"})
+    db.execute_update("buildings", building_id, {"location": "North"})
+    machine_id = db.execute_insert("vending_machines", {"name": "Snack 1", "building_id": building_id})
+    db.execute_delete("vending_machines", machine_id)
+
+    # Writes only go to the journal; the snapshot is untouched until a checkpoint
+    assert (os.path.getmtime('data/store.json'), os.path.getsize('data/store.json')) == snapshot
+    with open('data/store.json.journal') as f:
+        assert len(f.readlines()) == 4
+
+    reopened = JsonDatabase('data/store.json', journal=True)
+    assert reopened.execute_query("buildings") == [{"id": building_id, "name": "Library", "location": "North"}]
+    assert reopened.execute_query("vending_machines") == []
+
+
+def test_torn_final_journal_line_is_ignored(workdir):
+    db = JsonDatabase('data/store.json', journal=True)
+    db.execute_insert("buildings", {"name": "Library", "location": "Central"})
+    # A crash part way through appending the next entry
+    with open('data/store.json.journal', 'a') as f:
+        f.write('{"op": "insert", "table": "buildings", "rec')
+
+    reopened = JsonDatabase('data/store.json', journal=True)
+    assert [b['name'] for b in reopened.execute_query("buildings")] == ["Library"]
+
+    # Writes after the recovery survive the next open too
+    reopened.execute_insert("buildings", {"name": "Gym", "location": "South"})
+    reopened.execute_insert("buildings", {"name": "Pool", "location": "East"})
+    again = JsonDatabase('data/store.json', journal=True)
+    assert [b['name'] for b in again.execute_query("buildings")] == ["Library", "Gym", "Pool"]
+
+
+def test_checkpoint_folds_journal_into_snapshot(workdir):
+    db = JsonDatabase('data/store.json', journal=True, checkpoint_interval=3)
+    for i in range(3):
+        db.execute_insert("products", {"name": f"Product {i}", "price": 1.0, "category": "Snacks"})
+
+    assert not os.path.exists('data/store.json.journal')
+    db.execute_insert("products", {"name": "Product 3", "price": 1.0, "category": "Snacks"})
+
+    # The snapshot holds the checkpointed rows and the journal the one since
+    with open('data/store.json') as f:
+        assert len(json.load(f)["products"]) == 3
+    with open('data/store.json.journal') as f:
+        assert len(f.readlines()) == 1
+    assert len(JsonDatabase('data/store.json', journal=True).execute_query("products")) == 4
+
+
+def test_failed_transaction_rolls_back_and_persists_nothing(workdir):
+    db = JsonDatabase('data/store.json', journal=True)
+    building_id = db.execute_insert("buildings", {"name": "Library", "location": "Central"})
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.execute_update("buildings", building_id, {"location": "North", "floor": 2})
+            db.execute_insert("buildings", {"name": "Gym", "location": "South"})
+            db.execute_delete("buildings", building_id)
+            raise RuntimeError("interrupted")
+
+    expected = [{"id": building_id, "name": "Library", "location": "Central"}]
+    assert db.execute_query("buildings") == expected
+    assert JsonDatabase('data/store.json', journal=True).execute_query("buildings") == expected
+    # The rolled back insert's id is handed out again
+    assert db.execute_insert("buildings", {"name": "Gym", "location": "South"}) == building_id + 1
+
+
+def test_execute_many_commits_as_one_journal_entry(workdir):
+    db = JsonDatabase('data/store.json', journal=True)
+    ids = db.execute_many("products", [{"name": f"Product {i}", "price": 1.0, "category": "Snacks"} for i in range(5)])
+
+    assert ids == [1, 2, 3, 4, 5]
+    with open('data/store.json.journal') as f:
+        assert len(f.readlines()) == 1
+    assert len(JsonDatabase('data/store.json', journal=True).execute_query("products")) == 5
+
+
+# Adds one to product 1's stock `count` times, each in its own transaction
+INCREMENT = """
+import importlib, sys
+sys.path.insert(0, {parent!r})
+json_database = importlib.import_module({package!r} + '.json_database')
+db = json_database.JsonDatabase('data/store.json', shared=True)
+for _ in range({count}):
+    with db.transaction():
+        stock = db.get_by_id('products', 1)['stock']
+        db.execute_update('products', 1, {{'stock': stock + 1}})
+db.close()
+"""
+
+
+def test_shared_mode_processes_do_not_lose_updates(workdir):
+    db = JsonDatabase('data/store.json', shared=True)
+    db.execute_insert("products", {"name": "Cola", "stock": 0})
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = INCREMENT.format(parent=os.path.dirname(root), package=os.path.basename(root), count=25)
+
+    processes = [subprocess.Popen([sys.executable, "-c", script]) for _ in range(4)]
+    assert [process.wait(timeout=60) for process in processes] == [0] * 4
+
+    # Every process read the others' commits before writing its own
+    assert db.get_by_id("products", 1)["stock"] == 4 * 25
+
+
+def test_shared_mode_refreshes_and_detects_conflicts(workdir):
+    first = JsonDatabase('data/store.json', shared=True)
+    second = JsonDatabase('data/store.json', shared=True)
+    seen = second.version
+
+    first.execute_insert("buildings", {"name": "Library", "location": "Central"})
+
+    assert [b['name'] for b in second.execute_query("buildings")] == ["Library"]
+    with pytest.raises(ConflictError):
+        with second.transaction(expected_version=seen):
+            second.execute_insert("buildings", {"name": "Gym", "location": "South"})
+    assert [b['name'] for b in first.execute_query("buildings")] == ["Library"]
@@ -0,0 +1,64 @@
+import pytest
+
+from vending.inventory import InventoryManager
+from vending.sqlite_database import SqliteDatabase
+from vending.storage import MemoryDatabase
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_filters_treat_none_like_sql_null(workdir, backend):
+    db = MemoryDatabase() if backend == "memory" else SqliteDatabase('data/vending.db')
+    # Named after every sample machine, so name__ge='Test' picks out just these
+    for building_id in (3, None, 8):
+        db.execute_insert("vending_machines", {"name": f"Test {building_id}", "building_id": building_id})
+
+    def buildings(**criteria):
+        return [m['building_id'] for m in db.execute_query("vending_machines", name__ge='Test', **criteria)]
+
+    assert buildings(building_id__le=5) == [3]
+    assert buildings(building_id__gt=0) == [3, 8]
+    assert buildings(building_id__in=[3, None]) == [3]
+    assert buildings(building_id__in=(value for value in (8, 5))) == [8]
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_low_stock_crossing_is_reversed_by_rollback(workdir, backend):
+    db = MemoryDatabase() if backend == "memory" else SqliteDatabase('data/vending.db')
+    item = db.execute_insert("inventory", {"machine_id": 99, "product_id": 99, "quantity": 10})
+    crossings = []
+    manager = InventoryManager(db, on_low_stock=lambda item_id, *details: crossings.append((item_id, details[-1])))
+
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.execute_update("inventory", item, {"quantity": 0})
+            raise RuntimeError
+    manager.get_low_stock_items(threshold=None)
+    assert crossings == [(item, True), (item, False)]
+
+    db.execute_update("inventory", item, {"quantity": 1})
+    db.execute_delete("inventory", item)
+    assert crossings[2:] == [(item, True), (item, False)]
+
+
+def test_sqlite_pooled_threads_only_see_outside_commits(workdir):
+    from concurrent.futures import ThreadPoolExecutor
+    from vending.src.database import Database, PooledDatabase
+    db = SqliteDatabase(sql=PooledDatabase('data/vending.db'))
+    threads = [ThreadPoolExecutor(1), ThreadPoolExecutor(1)]
+
+    def generations():
+        # Alternate between the two threads and so their two connections
+        return [thread.submit(db.generation, "inventory").result() for thread in threads]
+
+    try:
+        generations()
+        # A commit moves data_version on every connection but the one making it
+        threads[0].submit(db.execute_update, "inventory", 1, {"quantity": 50}).result()
+        generations()
+        settled = generations()
+        assert generations() == settled
+        Database('data/vending.db').execute_insert("UPDATE inventory SET quantity = 0 WHERE id = 1")
+        assert min(generations()) > max(settled)
+    finally:
+        for thread in threads:
+            thread.shutdown()
@@ -0,0 +1,40 @@
+import asyncio
+
+from vending.telemetry import run_simulation
+
+
+def test_simulation_applies_every_vend(db):
+    stats = asyncio.run(run_simulation(db, machines=4, events=50, flush_interval=0.05))
+
+    # Each machine's client cycles through its stocked products
+    assert stats["received"] == stats["applied"] == 4 * 50
+    assert stats["rejected"] == stats["unknown_items"] == stats["failed_commits"] == 0
+    assert stats["commits"] >= 1
+    assert stats["pending"] == 0
+    quantities = {(item['machine_id'], item['product_id']): item['quantity'] for item in db.execute_query("inventory")}
+    assert quantities == {(1, 1): 75, (1, 2): 75, (2, 3): 75, (2, 4): 75, (3, 1): 50, (4, 6): 50}
+
+
+def test_small_max_pending_applies_backpressure(db):
+    # The timer never fires during the run, so every commit but the last
+    # is a flush forced by a full queue
+    stats = asyncio.run(run_simulation(db, machines=4, events=200, flush_interval=60, max_pending=10))
+
+    assert stats["applied"] == 4 * 200
+    assert stats["backpressure_waits"] > 0
+    assert stats["commits"] > 1
+    # 200 vends of each product overdraw every 100-unit stock, which stops at zero
+    assert [item['quantity'] for item in db.execute_query("inventory")] == [0] * 6
+
+
+def test_main_serves_telemetry_on_the_configured_database(workdir, monkeypatch):
+    import vending.main as main
+    from vending.telemetry import TelemetryServer
+    served = []
+
+    async def serve_forever(self):
+        served.append((type(self.db), self.host, self.port, self.flush_interval))
+    monkeypatch.setattr(TelemetryServer, "serve_forever", serve_forever)
+
+    main.main(["--telemetry", "--port", "9000", "--flush-interval", "0.5"])
+    assert served == [(main.Database, "127.0.0.1", 9000, 0.5)]